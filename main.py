@@ -21,15 +21,15 @@ async def main():
     #     await paratranz.download()
 
     """twee3"""
-    twee3parser = Twee3Parser()
-    twee3reviewer = Twee3Reviewer()
-    twee3parser.get_all_elements_info(is_old_macro=True)
-    twee3reviewer.validate_all_elements()
+    twee3parser = Twee3Parser(use_cache=True)
+    twee3parser.get_all_elements_stores(is_old_macro=True)
+    twee3reviewer = Twee3Reviewer(run_id=twee3parser.run_id)
+    twee3reviewer.save_report(twee3reviewer.validate_all_elements())
     """js"""
-    jsparser = JavaScriptParser()
+    jsparser = JavaScriptParser(run_id=twee3parser.run_id, use_cache=True)
     jsparser.tokenize()
-    jsreviewer = JavascriptReviewer()
-    jsreviewer.validate_basic_syntax()
+    jsreviewer = JavascriptReviewer(use_cache=True)
+    jsreviewer.save_report(jsreviewer.validate_basic_syntax())
 
     end = time.time()
     return end - start
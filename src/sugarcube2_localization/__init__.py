@@ -1,9 +1,11 @@
 from .core import *
 from .tools import *
 
+from .cache import *
 from .config import *
 from .database import *
 from .exceptions import *
 from .gui import *
 from .log import *
+from .search import *
 from .toast import *
\ No newline at end of file
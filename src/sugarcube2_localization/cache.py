@@ -0,0 +1,108 @@
+"""Persistent per-file caches of parsed results, keyed by file content hash."""
+import pickle
+import shutil
+
+from contextlib import suppress
+from hashlib import md5
+from pathlib import Path
+from typing import Any, Iterable
+
+from sugarcube2_localization.config import DIR_CACHE
+from sugarcube2_localization.log import logger
+
+
+class ParseCache:
+    """
+    One directory per namespace, one pickle file per source file.
+    The manifest maps each relative filepath to the content hash its entry was built from,
+    so only entries whose file is unchanged are ever loaded.
+    When `version` differs from the one on disk, the whole namespace is dropped.
+    """
+    def __init__(self, namespace: str, version: str, directory: Path = DIR_CACHE):
+        self._directory: Path = directory / namespace
+        self._version: str = version
+        self._manifest: dict[str, str] = {}
+        self._logger = logger.bind(project_name="CCH")
+        self._load()
+
+    @staticmethod
+    def hash_content(content: str | bytes) -> str:
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return md5(content).hexdigest()
+
+    @staticmethod
+    def game_namespace(kind: str, game_root: Path) -> str:
+        """Namespace of one game, keyed by its resolved path so that games in same-named directories never share a cache."""
+        return f"{kind}/{game_root.name}-{ParseCache.hash_content(str(game_root.resolve()))[:12]}"
+
+    def get(self, filepath: str, content_hash: str) -> Any | None:
+        """Cached data of the file, None if missing or built from other content."""
+        if self._manifest.get(filepath) != content_hash:
+            return None
+        try:
+            with self._entry_path(filepath).open("rb") as fp:
+                return pickle.load(fp)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            self._manifest.pop(filepath, None)
+            return None
+
+    def set(self, filepath: str, content_hash: str, data: Any) -> None:
+        with self._entry_path(filepath).open("wb") as fp:
+            pickle.dump(data, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        self._manifest[filepath] = content_hash
+
+    def evict(self, alive_filepaths: Iterable[str]) -> int:
+        """Remove entries of files which no longer exist."""
+        dead_filepaths = self._manifest.keys() - set(alive_filepaths)
+        for filepath in dead_filepaths:
+            with suppress(FileNotFoundError):
+                self._entry_path(filepath).unlink()
+            self._manifest.pop(filepath)
+        if dead_filepaths:
+            self._logger.debug(f"{len(dead_filepaths)} stale entries evicted from {self._directory.name}.")
+        return len(dead_filepaths)
+
+    def save(self) -> None:
+        with (self._directory / "manifest.pickle").open("wb") as fp:
+            pickle.dump({"version": self._version, "files": self._manifest}, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def clear(self) -> None:
+        with suppress(FileNotFoundError):
+            shutil.rmtree(self._directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._manifest = {}
+
+    def _load(self) -> None:
+        try:
+            with (self._directory / "manifest.pickle").open("rb") as fp:
+                manifest = pickle.load(fp)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            manifest = None
+
+        if not manifest or manifest.get("version") != self._version:
+            self.clear()
+            return
+        self._manifest = manifest["files"]
+
+    def _entry_path(self, filepath: str) -> Path:
+        return self._directory / f"{md5(filepath.encode('utf-8')).hexdigest()}.pickle"
+
+    def __contains__(self, filepath: str) -> bool:
+        return filepath in self._manifest
+
+    def __len__(self) -> int:
+        return len(self._manifest)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+
+__all__ = [
+    "ParseCache",
+]
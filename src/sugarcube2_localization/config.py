@@ -39,17 +39,49 @@ class FilepathSettings(BaseSettings):
     data: Path = Field(default=Path("data"))
     log: Path = Field(default=Path("data/log"))
     database: Path = Field(default=Path("data/database"))
+    cache: Path = Field(default=Path("data/cache"))
     paratranz: Path = Field(default=Path("data/paratranz"))
     repo: Path = Field(default=Path("repositories"))  # hard coded
     resources: Path = Field(default=Path("resources"))
     tmp: Path = Field(default=Path("data/tmp"))
 
 
+class DatabaseSettings(BaseSettings):
+    """About the sqlite database"""
+    model_config = SettingsConfigDict(env_prefix="DATABASE_")
+
+    bulk_insert: bool = Field(default=True, description="批量写入 (Core executemany)，关闭则逐个创建 ORM 对象写入")
+    batch_size: int = Field(default=10000, description="批量写入时每批的行数")
+    queue_size: int = Field(default=64, description="边解析边写入时，等待写入的块数上限 (块为一个文件的段落、一个段落的元素等)")
+
+    journal_mode: str = Field(default="WAL")
+    # 读取时的安全配置
+    synchronous: str = Field(default="NORMAL", description="WAL 下 NORMAL 不会损坏数据库，只可能丢失最后的事务")
+    cache_size: int = Field(default=-2000, description="负数单位为 KiB，即 sqlite 默认的 2MiB")
+    temp_store: str = Field(default="DEFAULT")
+    # 批量写入时的配置，只用于写入的那个连接；数据库中保存着多次解析的结果，写入中断不能损坏之前的解析，因此 synchronous 默认不设为 OFF。
+    # 写入都在一个事务中，synchronous 只在提交时起作用，与默认配置的差别主要在索引超出缓存时；实际收益以 Benchmark.sqlite_ingest 为准
+    ingest: bool = Field(default=True, description="批量写入时是否切换到下面的配置")
+    ingest_synchronous: str = Field(default="NORMAL", description="同上，WAL 下写入中断只会丢失本次未提交的事务")
+    ingest_cache_size: int = Field(default=-262144, description="256MiB")
+    ingest_temp_store: str = Field(default="MEMORY")
+    # 全文索引
+    fts: bool = Field(default=False, description="为纯文本元素建立 FTS5 全文索引，用于 search_elements")
+    fts_tokenizer: str = Field(default="unicode61", description="FTS5 分词器，需要任意子串匹配时可用 trigram")
+
+
 class DefaultGames(Enum):
     degrees_of_lewdity = "degrees-of-lewdity"
     degrees_of_lewdity_plus = "degrees-of-lewdity-plus"
 
 
+class JavaScriptSettings(BaseSettings):
+    """About parsing JavaScript with acorn"""
+    model_config = SettingsConfigDict(env_prefix="JAVASCRIPT_")
+
+    backend: str = Field(default="auto", description="运行 acorn 的 JS 引擎：dukpy / node，auto 为首次运行时比较后选最快的")
+
+
 class GitHubSettings(BaseSettings):
     """About GitHub"""
     model_config = SettingsConfigDict(env_prefix='GITHUB_')
@@ -71,6 +103,8 @@ class Settings(BaseSettings):
     github: GitHubSettings = GitHubSettings()
     project: ProjectSettings = ProjectSettings()
     filepath: FilepathSettings = FilepathSettings()
+    database: DatabaseSettings = DatabaseSettings()
+    javascript: JavaScriptSettings = JavaScriptSettings()
 
 
 settings = Settings()
@@ -78,6 +112,7 @@ DIR_ROOT = settings.filepath.root
 DIR_DATA = DIR_ROOT / settings.filepath.data
 DIR_LOG = DIR_ROOT / settings.filepath.log
 DIR_DATABASE = DIR_ROOT / settings.filepath.database
+DIR_CACHE = DIR_ROOT / settings.filepath.cache
 DIR_RESOURCES = DIR_ROOT / settings.filepath.resources
 DIR_REPOSITORY = DIR_ROOT / settings.filepath.repo
 DIR_TMP = DIR_ROOT / settings.filepath.tmp
@@ -93,6 +128,7 @@ __all__ = [
     "DIR_DATA",
     "DIR_LOG",
     "DIR_DATABASE",
+    "DIR_CACHE",
     "DIR_RESOURCES",
     "DIR_REPOSITORY",
     "DIR_TMP",
@@ -2,4 +2,6 @@ from .parser import *
 from .reviewer import *
 from .schema import *
 
+from .acorn import *
+from .jsbackend import *
 from .utils import *
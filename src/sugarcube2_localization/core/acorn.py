@@ -0,0 +1,265 @@
+"""
+Parse JavaScript files with acorn, shared by `JavaScriptParser` and `JavascriptReviewer`.
+
+整个进程共用一个 JS 引擎 (见 `get_acorn_service` 与 jsbackend)：acorn 只载入一次，
+每个文件只解析一次，解析结果同时含有顶层节点与语法错误，两者各取所需。
+
+acorn 生成的完整语法树不会传回 Python (经 JSON 在 Duktape 与 Python 间复制，大文件的主要开销)，
+JS 一侧只返回所需的最小投影：顶层节点的 [类型, 起点, 终点]，或语法错误的位置；
+只检查语法时 (`nodes=False`) 连顶层节点也不返回。
+
+acorn 使用随项目提交的固定版本 (resources/js/acorn.js，见 ACORN_VERSION)，启动时直接载入，不联网；
+更新版本时执行一次 `python -m sugarcube2_localization.core.acorn`。
+"""
+import dukpy
+import shutil
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from loguru._logger import Logger
+from pathlib import Path
+from typing import Iterator
+
+from sugarcube2_localization.cache import ParseCache
+from sugarcube2_localization.config import DIR_RESOURCES, settings
+from sugarcube2_localization.exceptions import AcornEvaluationException, AcornNotInstalledException
+from sugarcube2_localization.log import logger
+
+from sugarcube2_localization.core.jsbackend import JSBackend, create_backend
+from sugarcube2_localization.core.utils import get_workers_count
+from sugarcube2_localization.core.schema.data_model import AcornParserOptions, JSParseResultModel, JSSyntaxErrorModel, NodeModel
+
+"""JS 一侧返回的投影格式有变化时加一，持久缓存随之失效"""
+ACORN_PROJECTION_VERSION = 1
+"""随项目提交的 acorn 版本，更新时改这里再执行 `install_acorn`"""
+ACORN_VERSION = "8.15.0"
+"""acorn 的 dist/acorn.js (可直接在 Duktape 中运行的 UMD 单文件) 及其许可证存放处"""
+DIR_ACORN = DIR_RESOURCES / "js"
+
+
+class AcornService:
+	"""
+	One preloaded JS engine running acorn, chosen by `JavaScriptSettings.backend`.
+
+	解析结果按 (文件路径, 解析选项) 留在内存中，文件修改时间或大小变化后重新解析；
+	只检查语法的调用可直接使用含节点的结果，反之则需重新解析。
+	"""
+	def __init__(self, bundle_dir: Path = DIR_ACORN, backend: str | None = None):
+		self._logger = logger.bind(project_name="ACN")
+		self._bundle_dir = bundle_dir
+		self._backend_name: str = backend or settings.javascript.backend
+		self._backend: JSBackend | None = None
+		self._results: dict[tuple[Path, str], tuple[tuple[int, int], JSParseResultModel]] = {}
+		self._caches: dict[str, ParseCache] = {}
+		self._version: str | None = None
+
+		self.init_environment()
+
+	def init_environment(self) -> None:
+		"""Load the vendored acorn into the engine once, never touches the network."""
+		if not (self.bundle_dir / "acorn.js").exists():
+			raise AcornNotInstalledException(self.bundle_dir)
+		self._backend = create_backend(self._backend_name, self.bundle_dir)
+		self._version = self.backend.version
+		if self.version != ACORN_VERSION:
+			self.logger.warning(f"acorn {self.version} loaded from {self.bundle_dir}, expected {ACORN_VERSION}; run install_acorn to update it.")
+
+	def parse(self, filepath: Path, options: AcornParserOptions | None = None, *, nodes: bool = True, cache: ParseCache | None = None, cache_key: str | None = None) -> JSParseResultModel:
+		"""
+		Parse the file, or return the result of the last parse if it is unchanged.
+		`nodes` 为 False 时只检查语法，结果中的 nodes 可能为 None。
+
+		`cache` 为 `open_cache` 得到的持久缓存时，内容未变的文件直接取缓存，不经过 JS 引擎；
+		`cache_key` 为文件在缓存中的键 (一般为相对路径)，默认为 filepath。
+		"""
+		options = options or AcornParserOptions()
+		cache_key = cache_key or str(filepath)
+		result, js_code = self._lookup(filepath, options, nodes, cache, cache_key)
+		if result is None:
+			result = self._store(filepath, options, cache, cache_key, js_code, self._evaluate(js_code, options, nodes))
+		return result
+
+	def iter_parse(self, filepaths: list[Path], options: AcornParserOptions | None = None, *, nodes: bool = True, cache: ParseCache | None = None, cache_keys: list[str] | None = None, max_workers: int | None = 1) -> Iterator[JSParseResultModel]:
+		"""
+		Parse the files like `parse`, yield results in the order of filepaths.
+
+		内存与持久缓存中都没有的文件交给 `max_workers` 个子进程 (见 `get_workers_count`) 解析，
+		每个子进程各有一个预先载入 acorn 的解释器；文件从大到小提交以均衡负载，结果仍按 filepaths 的顺序产出。
+		并行时产出第一项前已提交全部文件，各结果产出后即释放。
+		"""
+		options = options or AcornParserOptions()
+		cache_keys = cache_keys or [str(filepath) for filepath in filepaths]
+		if max_workers == 1:
+			for filepath, cache_key in zip(filepaths, cache_keys):
+				yield self.parse(filepath, options, nodes=nodes, cache=cache, cache_key=cache_key)
+			return
+
+		lookups = [self._lookup(filepath, options, nodes, cache, cache_key) for filepath, cache_key in zip(filepaths, cache_keys)]
+		missing = sorted((idx for idx, (result, _) in enumerate(lookups) if result is None), key=lambda idx: len(lookups[idx][1]), reverse=True)
+		if len(missing) <= 1:
+			for filepath, cache_key, (result, js_code) in zip(filepaths, cache_keys, lookups):
+				yield result if result is not None else self._store(filepath, options, cache, cache_key, js_code, self._evaluate(js_code, options, nodes))
+			return
+
+		max_workers = min(get_workers_count(max_workers), len(missing))
+		with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self.bundle_dir, self.backend.name)) as executor:
+			futures = {
+				idx: executor.submit(_evaluate_in_worker, lookups[idx][1], options, nodes)
+				for idx in missing
+			}
+			for idx, (filepath, cache_key, (result, js_code)) in enumerate(zip(filepaths, cache_keys, lookups)):
+				yield result if result is not None else self._store(filepath, options, cache, cache_key, js_code, futures.pop(idx).result())
+		self.logger.debug(f"{len(missing)}/{len(filepaths)} files parsed by {max_workers} workers.")
+
+	def parse_code(self, js_code: str, filepath: Path, options: AcornParserOptions, *, nodes: bool = True) -> JSParseResultModel:
+		"""Parse the source without caching, `filepath` is only recorded in the result."""
+		return self._to_result(self._evaluate(js_code, options, nodes), js_code, filepath)
+
+	def open_cache(self, game_root: Path, options: AcornParserOptions) -> ParseCache:
+		"""
+		Persistent cache of parse results under DIR_DATA, one per game and acorn options.
+
+		同一进程中相同的游戏与选项共用同一个缓存对象 (否则各自保存清单时会互相覆盖)；
+		acorn 版本或返回的投影 (ACORN_PROJECTION_VERSION) 变化后整个缓存失效。
+		"""
+		namespace = f"{ParseCache.game_namespace('acorn', game_root)}/{ParseCache.hash_content(options.model_dump_json())}"
+		if namespace not in self._caches:
+			self._caches[namespace] = ParseCache(namespace, f"{self.version}:{ACORN_PROJECTION_VERSION}")
+		return self._caches[namespace]
+
+	def _lookup(self, filepath: Path, options: AcornParserOptions, nodes: bool, cache: ParseCache | None, cache_key: str) -> tuple[JSParseResultModel | None, str]:
+		"""从内存或持久缓存中取结果，没有时结果为 None；同时返回读到的源码 (内存命中时不读文件，为空)"""
+		stat = filepath.stat()
+		if (cached := self._results.get((filepath, options.model_dump_json()))) is not None and cached[0] == (stat.st_mtime_ns, stat.st_size) and (cached[1].nodes is not None or not nodes):
+			return cached[1], ""
+
+		with filepath.open("r", encoding="utf-8") as fp:
+			js_code = fp.read()
+		if cache is None:
+			return None, js_code
+
+		projection = cache.get(cache_key, ParseCache.hash_content(js_code))
+		if projection is None or (nodes and not self._has_nodes(projection)):
+			return None, js_code
+		return self._remember(filepath, options, self._to_result(projection, js_code, filepath)), js_code
+
+	def _store(self, filepath: Path, options: AcornParserOptions, cache: ParseCache | None, cache_key: str, js_code: str, projection: dict) -> JSParseResultModel:
+		"""记下 JS 引擎新解析出的结果"""
+		if cache is not None:
+			cache.set(cache_key, ParseCache.hash_content(js_code), projection)
+		return self._remember(filepath, options, self._to_result(projection, js_code, filepath))
+
+	def _remember(self, filepath: Path, options: AcornParserOptions, result: JSParseResultModel) -> JSParseResultModel:
+		stat = filepath.stat()
+		self._results[(filepath, options.model_dump_json())] = ((stat.st_mtime_ns, stat.st_size), result)
+		return result
+
+	def _evaluate(self, js_code: str, options: AcornParserOptions, nodes: bool) -> dict:
+		"""
+		在 JS 引擎中解析，返回 JS 一侧的投影：{"nodes": [[类型, 起点, 终点], ...]}、{"error": {...}} 或 {}。
+		acorn 抛出的不是语法错误 (没有位置) 时直接报错，不当作文件的语法错误，也不写入缓存。
+		"""
+		projection = self.backend.parse(js_code, options.model_dump(), nodes)
+		if "error" in projection and projection["error"].get("loc") is None:
+			raise AcornEvaluationException(projection["error"].get("message"))
+		return projection
+
+	@staticmethod
+	def _has_nodes(projection: dict) -> bool:
+		"""只检查语法时得到的投影不含节点，需要节点时须重新解析"""
+		return "nodes" in projection or "error" in projection
+
+	@staticmethod
+	def _to_result(projection: dict, js_code: str, filepath: Path) -> JSParseResultModel:
+		if "error" in projection:
+			return JSParseResultModel(filepath=filepath, nodes=[], error=JSSyntaxErrorModel(**projection["error"]))
+
+		if "nodes" not in projection:
+			return JSParseResultModel(filepath=filepath)
+
+		return JSParseResultModel(filepath=filepath, nodes=[
+			NodeModel(
+				filepath=filepath,
+				type=type_,
+				body=js_code[pos_start:pos_end],
+				pos_start=pos_start,
+				pos_end=pos_end,
+				length=pos_end-pos_start
+			)
+			for type_, pos_start, pos_end in projection["nodes"]
+		])
+
+	def clear(self) -> None:
+		"""Forget all parse results."""
+		self._results.clear()
+
+	""" Getters & Setters """
+
+	@property
+	def backend(self) -> JSBackend:
+		return self._backend
+
+	@property
+	def bundle_dir(self) -> Path:
+		return self._bundle_dir
+
+	@property
+	def version(self) -> str:
+		"""Version of the loaded acorn."""
+		return self._version
+
+	@property
+	def logger(self) -> Logger:
+		return self._logger
+
+
+"""进程内共用的实例，首次使用时创建"""
+_acorn_service: AcornService | None = None
+
+
+def get_acorn_service(bundle_dir: Path = DIR_ACORN, backend: str | None = None) -> AcornService:
+	"""The AcornService shared within this process, arguments only matter on first call."""
+	global _acorn_service
+	if _acorn_service is None:
+		_acorn_service = AcornService(bundle_dir, backend)
+	return _acorn_service
+
+
+def install_acorn(version: str = ACORN_VERSION, bundle_dir: Path = DIR_ACORN) -> Path:
+	"""
+	One-off: download acorn from npm and vendor its single-file build into `bundle_dir`.
+
+	只在更新 ACORN_VERSION 时执行，需联网；生成的 acorn.js 与许可证随项目提交，之后的运行均不再联网。
+	"""
+	bundle_dir.mkdir(parents=True, exist_ok=True)
+	with tempfile.TemporaryDirectory() as modulesdir:
+		dukpy.install_jspackage(package_name="acorn", version=version, modulesdir=modulesdir)
+		package_dir = Path(modulesdir) / "acorn"
+		shutil.copyfile(package_dir / "dist" / "acorn.js", bundle_dir / "acorn.js")
+		shutil.copyfile(package_dir / "LICENSE", bundle_dir / "acorn.LICENSE")
+	logger.info(f"acorn {version} vendored into {bundle_dir}")
+	return bundle_dir / "acorn.js"
+
+
+def _init_worker(bundle_dir: Path, backend: str) -> None:
+	"""子进程启动时即载入 acorn，使用与主进程相同的引擎；fork 出的子进程沿用父进程中已载入的引擎"""
+	get_acorn_service(bundle_dir, backend)
+
+
+def _evaluate_in_worker(js_code: str, options: AcornParserOptions, nodes: bool) -> dict:
+	"""Run in worker process, return the projection only."""
+	return get_acorn_service()._evaluate(js_code, options, nodes)
+
+
+__all__ = [
+	"ACORN_PROJECTION_VERSION",
+	"ACORN_VERSION",
+	"DIR_ACORN",
+	"AcornService",
+	"get_acorn_service",
+	"install_acorn",
+]
+
+
+if __name__ == '__main__':
+	install_acorn()
@@ -0,0 +1,249 @@
+"""
+JavaScript engines able to run the vendored acorn, used by `AcornService`.
+
+各引擎实现同一接口 `JSBackend.parse(js_code, options, nodes) -> 投影`，投影格式见 `PARSE_FUNCTION`：
+{"nodes": [[类型, 起点, 终点], ...]}、{"error": {pos, loc, raisedAt, message}}，只检查语法且无错误时为 {}。
+运行的都是同一份 acorn，结果一致，只是速度不同；`JavaScriptSettings.backend` 为 auto 时在首次使用时比较可用的引擎，选最快的一个。
+
+- dukpy: 进程内的 Duktape 解释器，总是可用
+- node: 常驻的 node 子进程 (PATH 中有 node 时)，经标准输入输出逐行收发 JSON
+"""
+import dukpy
+import json
+import os
+import shutil
+import subprocess
+import time
+
+from collections import deque
+from pathlib import Path
+from threading import Thread
+
+from sugarcube2_localization.cache import ParseCache
+from sugarcube2_localization.config import DIR_CACHE
+from sugarcube2_localization.exceptions import JSBackendNotAvailableException
+from sugarcube2_localization.log import logger
+
+from sugarcube2_localization.core.schema.data_model import AcornParserOptions
+
+"""在引擎中定义的解析函数，`acorn` 须已载入"""
+# language=JavaScript
+PARSE_FUNCTION = """
+function parse(code, options, nodes) {
+	var program;
+	try {
+		program = acorn.parse(code, options);
+	} catch (e) {
+		// 只有 acorn 的 SyntaxError 带有位置；其他异常 (如选项有误) 的 loc 为 null，由 AcornService 抛出
+		return {error: {pos: e.pos, loc: e.loc ? {line: e.loc.line, column: e.loc.column} : null, raisedAt: e.raisedAt, message: String(e.message || e)}};
+	}
+	if (!nodes) {
+		return {};
+	}
+	return {nodes: program.body.map(function (node) { return [node.type, node.start, node.end]; })};
+}
+"""
+
+
+class JSBackend:
+	"""
+	Base of the engines, loads acorn from `bundle_dir` on `load()`.
+
+	新的引擎继承此类，实现 `available`、`load`、`parse` (按需 `close`)，再加入 BACKENDS 即可。
+	"""
+	name: str = ""
+
+	def __init__(self, bundle_dir: Path):
+		self._bundle_dir = bundle_dir
+		self._version: str | None = None
+
+	@classmethod
+	def available(cls) -> bool:
+		"""Whether the engine can run on this machine."""
+		return True
+
+	def load(self) -> None:
+		"""Start the engine and load acorn, set `version`."""
+		raise NotImplementedError
+
+	def parse(self, js_code: str, options: dict, nodes: bool) -> dict:
+		"""Parse with acorn, return the projection."""
+		raise NotImplementedError
+
+	def close(self) -> None:
+		"""Release the engine."""
+
+	@property
+	def bundle_dir(self) -> Path:
+		return self._bundle_dir
+
+	@property
+	def version(self) -> str | None:
+		"""Version of the loaded acorn."""
+		return self._version
+
+
+class DukpyBackend(JSBackend):
+	"""`dukpy.JSInterpreter` in this process."""
+	name = "dukpy"
+
+	def __init__(self, bundle_dir: Path):
+		super().__init__(bundle_dir)
+		self._interpreter: dukpy.JSInterpreter | None = None
+
+	def load(self) -> None:
+		self._interpreter = dukpy.JSInterpreter()
+		self._interpreter.loader.register_path(self.bundle_dir)
+		self._interpreter.evaljs(f"var acorn = require('acorn');\n{PARSE_FUNCTION}")
+		self._version = self._interpreter.evaljs("acorn.version")
+
+	def parse(self, js_code: str, options: dict, nodes: bool) -> dict:
+		return self._interpreter.evaljs(
+			"parse(dukpy['js_code'], dukpy['options'], dukpy['nodes'])",
+			js_code=js_code,
+			options=options,
+			nodes=nodes,
+		)
+
+	@property
+	def interpreter(self) -> dukpy.JSInterpreter:
+		return self._interpreter
+
+
+class NodeBackend(JSBackend):
+	"""
+	A long-lived `node` subprocess, one JSON request / response per line.
+
+	子进程属于启动它的进程：fork 出的进程池子进程首次解析时会另起自己的 node，不与父进程共用管道。
+	node 的标准错误 (如弃用警告) 由单独的线程随时读走，只保留最后几行用于报错，不会写满管道使 node 阻塞。
+	"""
+	name = "node"
+
+	# language=JavaScript
+	SCRIPT = f"""
+	var acorn = require(process.argv[1]);
+	{PARSE_FUNCTION}
+	process.stdout.write(JSON.stringify(acorn.version) + "\\n");
+	require('readline').createInterface({{input: process.stdin, crlfDelay: Infinity}}).on('line', function (line) {{
+		var request = JSON.parse(line);
+		process.stdout.write(JSON.stringify(parse(request.code, request.options, request.nodes)) + "\\n");
+	}});
+	"""
+
+	def __init__(self, bundle_dir: Path):
+		super().__init__(bundle_dir)
+		self._process: subprocess.Popen | None = None
+		self._pid: int | None = None
+		self._stderr: deque[str] = deque(maxlen=20)
+		self._stderr_reader: Thread | None = None
+
+	@classmethod
+	def available(cls) -> bool:
+		return shutil.which("node") is not None
+
+	def load(self) -> None:
+		self._process = subprocess.Popen(
+			[shutil.which("node"), "-e", self.SCRIPT, str(self.bundle_dir / "acorn.js")],
+			stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+			text=True, encoding="utf-8",
+		)
+		self._pid = os.getpid()
+		self._stderr = deque(maxlen=20)
+		self._stderr_reader = Thread(target=self._stderr.extend, args=(self._process.stderr,), name="node-stderr", daemon=True)
+		self._stderr_reader.start()
+		self._version = json.loads(self._readline())
+
+	def parse(self, js_code: str, options: dict, nodes: bool) -> dict:
+		if self._pid != os.getpid():
+			self.load()
+		self._process.stdin.write(json.dumps({"code": js_code, "options": options, "nodes": nodes}) + "\n")
+		self._process.stdin.flush()
+		return json.loads(self._readline())
+
+	def close(self) -> None:
+		if self._process is not None and self._pid == os.getpid():
+			self._process.stdin.close()
+			self._process.wait()
+		self._process = None
+
+	def _readline(self) -> str:
+		line = self._process.stdout.readline()
+		if not line:
+			returncode = self._process.wait()
+			self._stderr_reader.join(timeout=1)
+			raise RuntimeError(f"node exited with {returncode}: {''.join(self._stderr).strip()}")
+		return line
+
+
+"""可选的引擎，按名称"""
+BACKENDS: dict[str, type[JSBackend]] = {
+	DukpyBackend.name: DukpyBackend,
+	NodeBackend.name: NodeBackend,
+}
+
+
+def create_backend(name: str, bundle_dir: Path) -> JSBackend:
+	"""
+	Load the engine named `name`, or the fastest available one if it is "auto".
+
+	auto 时以 acorn.js 本身为样本 (一份真实、足够大的 JS) 比较各可用引擎的解析耗时；
+	结果按 (acorn.js 内容, 可用引擎) 记在 DIR_CACHE 中，之后的运行直接沿用。
+	"""
+	if name != "auto":
+		if name not in BACKENDS or not BACKENDS[name].available():
+			raise JSBackendNotAvailableException(name)
+		backend = BACKENDS[name](bundle_dir)
+		backend.load()
+		return backend
+
+	candidates = [backend for backend in BACKENDS.values() if backend.available()]
+	sample = (bundle_dir / "acorn.js").read_text(encoding="utf-8")
+	key = f"{ParseCache.hash_content(sample)}:{','.join(backend.name for backend in candidates)}"
+	filepath = DIR_CACHE / "acorn" / "backend.json"
+	try:
+		chosen = json.loads(filepath.read_text(encoding="utf-8"))
+	except (OSError, ValueError):
+		chosen = {}
+	if chosen.get("key") == key and chosen.get("backend") in BACKENDS:
+		return create_backend(chosen["backend"], bundle_dir)
+
+	timings: dict[str, float] = {}
+	fastest: JSBackend | None = None
+	for backend_class in candidates:
+		backend = backend_class(bundle_dir)
+		backend.load()
+		timings[backend.name] = time_backend(backend, [sample])
+		if fastest is None or timings[backend.name] < timings[fastest.name]:
+			if fastest is not None:
+				fastest.close()
+			fastest = backend
+		else:
+			backend.close()
+
+	logger.bind(project_name="ACN").info(f"JavaScript backend: {fastest.name} ({', '.join(f'{name}: {timing:.3f}s' for name, timing in timings.items())})")
+	filepath.parent.mkdir(parents=True, exist_ok=True)
+	filepath.write_text(json.dumps({"key": key, "backend": fastest.name, "timings": timings}), encoding="utf-8")
+	return fastest
+
+
+def time_backend(backend: JSBackend, samples: list[str], *, options: dict | None = None, repeat: int = 3) -> float:
+	"""Best of `repeat` timings of parsing all samples with top-level nodes."""
+	options = options or AcornParserOptions(locations=False, ranges=False).model_dump()
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for sample in samples:
+			backend.parse(sample, options, True)
+		timings.append(time.perf_counter() - start)
+	return min(timings)
+
+
+__all__ = [
+	"PARSE_FUNCTION",
+	"JSBackend",
+	"DukpyBackend",
+	"NodeBackend",
+	"BACKENDS",
+	"create_backend",
+	"time_backend",
+]
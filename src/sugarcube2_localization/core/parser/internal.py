@@ -14,15 +14,18 @@ import shutil
 from contextlib import suppress
 from loguru._logger import Logger
 from pathlib import Path
-from typing import Iterator
+from typing import Iterable, Iterator
 
 from sugarcube2_localization.config import DIR_DOL
+from sugarcube2_localization.database import create_run, insert_rows
 from sugarcube2_localization.log import logger
+from sugarcube2_localization.core.schema.sql_model import FileModelTable
 
 
 class Parser:
-	def __init__(self, game_root: Path = DIR_DOL):
+	def __init__(self, game_root: Path = DIR_DOL, run_id: int | None = None):
 		self._game_root: Path = game_root       # Root path for the game needed to be localized, DoL as default
+		self._run_id: int | None = run_id       # Parse run which written rows belong to, created on first write if not given
 		self._logger = logger
 
 	@staticmethod
@@ -35,10 +38,26 @@ class Parser:
 	def get_all_filepaths(self) -> Iterator[Path]:
 		raise NotImplementedError
 
+	def _insert_files(self, filepaths: Iterable[Path]) -> dict[str, int]:
+		"""将读到的文件 (绝对路径) 记入 file 表，返回相对路径到 id 的映射，供段落、节点引用"""
+		filepaths = [str(filepath.relative_to(self.game_root)) for filepath in filepaths]
+		files_ids = insert_rows(FileModelTable, (
+			dict(run_id=self.run_id, filepath=filepath)
+			for filepath in filepaths
+		), returning_ids=True)
+		return dict(zip(filepaths, files_ids))
+
 	@property
 	def game_root(self) -> Path:
 		return self._game_root
 
+	@property
+	def run_id(self) -> int:
+		"""同一次解析的多个 parser 可传入同一个 run_id 共用"""
+		if self._run_id is None:
+			self._run_id = create_run(self.game_root)
+		return self._run_id
+
 	@property
 	def logger(self) -> Logger:
 		return self._logger
@@ -1,28 +1,29 @@
-import dukpy
-
-from sqlalchemy.orm import Session
 from pathlib import Path
 from typing import Iterator
 
-from sugarcube2_localization.config import DIR_DATA
-from sugarcube2_localization.database import ENGINE
+from sugarcube2_localization.cache import ParseCache
+from sugarcube2_localization.database import BatchWriter
 from sugarcube2_localization.exceptions import GameRootNotExistException
 from sugarcube2_localization.log import logger
 
+from sugarcube2_localization.core.acorn import AcornService, get_acorn_service
 from sugarcube2_localization.core.parser.internal import Parser
-from sugarcube2_localization.core.utils import get_all_filepaths
+from sugarcube2_localization.core.utils import get_all_filepaths, start_pool
 from sugarcube2_localization.core.schema.data_model import AcornParserOptions, NodeModel
 from sugarcube2_localization.core.schema.sql_model import NodeModelTable
 
 
 class JavaScriptParser(Parser):
-	def __init__(self, **kwargs):
+	def __init__(self, *, use_cache: bool = False, **kwargs):
 		super().__init__(**kwargs)
 
 		self._logger = logger.bind(project_name="JSP")
 
-		self._interpreter: dukpy.JSInterpreter = dukpy.JSInterpreter()
+		self._acorn: AcornService | None = None
 		self._parser_options: AcornParserOptions | None = None
+		self._use_cache = use_cache
+		"""Per-file acorn results under DIR_DATA, keyed by content hash, acorn version and options. Unchanged files skip the JS engine."""
+		self._cache: ParseCache | None = None
 
 		self._suffix = ".js"
 
@@ -32,95 +33,68 @@ class JavaScriptParser(Parser):
 		self.init_environment()
 
 	def init_environment(self):
-		"""Install required JavaScript dependencies."""
-		dukpy.install_jspackage(
-			package_name='acorn',
-			version=None,
-			modulesdir=DIR_DATA / "node_modules",
-		)
-		self.interpreter.loader.register_path(DIR_DATA / 'node_modules' / 'acorn' / 'dist')
-		self.parser_options = AcornParserOptions()
+		"""Use the acorn interpreter shared with JavascriptReviewer."""
+		self.acorn = get_acorn_service()
+		# 只用到顶层节点的类型与起止位置，不需要 acorn 额外生成 loc / range
+		self.parser_options = AcornParserOptions(locations=False, ranges=False)
+		self._cache = self.acorn.open_cache(self.game_root, self.parser_options) if self._use_cache else None
 
 	def get_all_filepaths(self) -> Iterator[Path]:
 		"""Get all twinescript absolute filepaths."""
 		if not self.game_root.exists():
 			self.logger.error(f"Game root does not exist: {self.game_root}")
 			raise GameRootNotExistException
-		self.all_filepaths = get_all_filepaths(self.suffix, self.game_root)
+		self.all_filepaths = sorted(get_all_filepaths(self.suffix, self.game_root))
 		return self.all_filepaths
 
-	def tokenize(self) -> ...:
-		all_filepaths = self.all_filepaths or self.get_all_filepaths()
-		all_token_info: list[NodeModel] = []
-		for filepath in all_filepaths:
-			all_token_info = self._tokenize(filepath, all_token_info)
-
-		with Session(ENGINE) as session:
-			session.add_all(
-				NodeModelTable(
-					filepath=node_model.filepath.__str__(),
-					type=node_model.type,
-					body=node_model.body,
-					pos_start=node_model.pos_start,
-					pos_end=node_model.pos_end,
-					length=node_model.length,
-				)
-				for node_model in all_token_info
-			)
-			session.commit()
-
-	def _tokenize(self, filepath: Path, all_token_info: list[NodeModel]) -> list[NodeModel]:
-		with filepath.open("r", encoding="utf-8") as fp:
-			js_code = fp.read()
-
-		# language=JavaScript
-		tokenizer = \
+	def tokenize(self, *, max_workers: int | None = 1) -> ...:
 		"""
-		var acorn = require('acorn');
-		var options = Object.assign({}, dukpy['options']);
-		function tokenize() {
-			try {
-				return acorn.parse(dukpy['js_code'], options);
-			} catch (e) {
-				return Object.assign({error: true}, e);
-			}
-		}
-		
-		tokenize();
+		提取各文件的顶层节点写入数据库，按路径顺序写入。
+		`max_workers` 为解析文件的进程数 (见 `get_workers_count`)。
 		"""
-
-		result = self.interpreter.evaljs(
-			code=tokenizer,
-			js_code=js_code,
-            options=self.parser_options.model_dump()
-		)
-
-		if "error" in result:
-			self.logger.bind(filepath=filepath).warning(f"Tokenization error")
-			return all_token_info
-
-		if not result or "body" not in result:
-			self.logger.bind(filepath=filepath).warning("No root node")
-			return all_token_info
-
-		all_token_info.extend([
-			NodeModel(
-				filepath=filepath.relative_to(self.game_root),
-				type=node["type"],
-				body=js_code[node["start"]:node["end"]],
-				pos_start=node["start"],
-				pos_end=node["end"],
-				length=node["end"]-node["start"]
-			)
-			for node in result["body"]
-		])
-		return all_token_info
+		all_filepaths = list(self.all_filepaths or self.get_all_filepaths())
+		files_ids = self._insert_files(all_filepaths)
+		# 每个文件的节点在解析下一个文件的同时写入数据库
+		all_nodes = start_pool(self._iter_tokenize(all_filepaths, max_workers))
+		with BatchWriter(NodeModelTable) as writer:
+			for filepath, nodes in zip(all_filepaths, all_nodes):
+				file_id = files_ids[filepath.relative_to(self.game_root).__str__()]
+				writer.write(
+					dict(
+						run_id=self.run_id,
+						file_id=file_id,
+						type=node_model.type,
+						body=node_model.body,
+						pos_start=node_model.pos_start,
+						pos_end=node_model.pos_end,
+						length=node_model.length,
+					)
+					for node_model in nodes
+				)
+		if self.cache is not None:
+			self.cache.evict(str(filepath.relative_to(self.game_root)) for filepath in all_filepaths)
+			self.cache.save()
+
+	def _iter_tokenize(self, filepaths: list[Path], max_workers: int | None) -> Iterator[list[NodeModel]]:
+		"""逐个文件产出顶层节点；同一文件的解析结果与 JavascriptReviewer 共用"""
+		for result in self.acorn.iter_parse(
+			filepaths, self.parser_options,
+			cache=self.cache, cache_keys=[str(filepath.relative_to(self.game_root)) for filepath in filepaths],
+			max_workers=max_workers,
+		):
+			if result.error is not None:
+				self.logger.bind(filepath=result.filepath).warning(f"Tokenization error")
+			yield result.nodes
 
 	""" Getters & Setters """
 
 	@property
-	def interpreter(self) -> dukpy.JSInterpreter:
-		return self._interpreter
+	def acorn(self) -> AcornService:
+		return self._acorn
+
+	@acorn.setter
+	def acorn(self, _: AcornService):
+		self._acorn = _
 
 	@property
 	def parser_options(self) -> AcornParserOptions:
@@ -130,6 +104,10 @@ class JavaScriptParser(Parser):
 	def parser_options(self, _: AcornParserOptions):
 		self._parser_options = _
 
+	@property
+	def cache(self) -> ParseCache | None:
+		return self._cache
+
 	@property
 	def suffix(self) -> str:
 		return self._suffix
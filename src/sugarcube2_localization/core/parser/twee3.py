@@ -19,32 +19,47 @@ Twinescript File
 			   ┗━ Plain Text:       except of any elements above
 """
 
+import heapq
 import re
 
 from collections import defaultdict
+from itertools import groupby
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from hashlib import md5
 
-from sqlalchemy.orm import Session
-from typing import Iterator
+from typing import Callable, Iterable, Iterator
 
-from sugarcube2_localization.database import ENGINE
-from sugarcube2_localization.exceptions import GameRootNotExistException
+from sugarcube2_localization.cache import ParseCache
+from sugarcube2_localization.config import settings
+from sugarcube2_localization.database import BatchWriter, insert_rows
+from sugarcube2_localization.exceptions import GameRootNotExistException, PassageNotWrittenException
 from sugarcube2_localization.log import logger
+from sugarcube2_localization.search import index_elements
 
-from sugarcube2_localization.core.utils import get_all_filepaths
+from sugarcube2_localization.core.utils import IntervalIndex, get_all_filepaths, get_workers_count, start_pool
 from sugarcube2_localization.core.parser.internal import Parser
 from sugarcube2_localization.core.schema.enum import ModelField, Patterns
-from sugarcube2_localization.core.schema.data_model import WidgetModel, PassageModel, ElementModel
-from sugarcube2_localization.core.schema.sql_model import PassageModelTable, ElementModelTable
+from sugarcube2_localization.core.schema.data_model import ElementModel, WidgetModel, PassageModel
+from sugarcube2_localization.core.schema.sql_model import PassageModelTable, WidgetModelTable, ElementModelTable
+from sugarcube2_localization.core.schema.store import ElementStore, ElementView
+
+"""Bump when parsed passages / elements change, so that the parse cache is dropped."""
+PARSER_VERSION = 4
 
 
 class Twee3Parser(Parser):
-	def __init__(self, **kwargs):
+	def __init__(self, *, use_cache: bool = False, **kwargs):
 		super().__init__(**kwargs)
 
 		self._logger = logger.bind(project_name="T3P")
 
+		"""Per-file parse cache under DIR_DATA, keyed by content hash. Only changed files are parsed again."""
+		self._cache: ParseCache | None = ParseCache(ParseCache.game_namespace("twee3", self.game_root), str(PARSER_VERSION)) if use_cache else None
+		"""Cache entries of this run: content hash and parsed data of each file, by relative filepath."""
+		self._cache_entries: dict[str, tuple[str, dict]] = {}
+
 		self._suffix = ".twee"
 
 		"""All filepaths with suffix '.twee'"""
@@ -54,16 +69,18 @@ class Twee3Parser(Parser):
 		self._all_passages: list[PassageModel] | None = None
 		"""Same as above, indexed by passage title."""
 		self._all_passages_by_passage: dict[str, PassageModel] | None = None
+		"""Primary keys of passages in database, in the same order as passages (titles may repeat in a file). Elements refer to them instead of copying bodies."""
+		self._all_passages_ids: list[int] | None = None
 
-		"""All elements' info: type, body, position and length."""
-		self._all_elements: list[ElementModel] | None = None
-		"""Same as above, indexed by passage title."""
-		self._all_elements_by_passage: dict[str, list[ElementModel]] | None = None
+		"""All elements' info: type, body, position and length, stored column by column for each passage, indexed by passage title."""
+		self._all_elements_stores: dict[str, ElementStore] | None = None
 
 		"""All closed macros (eg: if, for, ...)"""
 		self._all_closed_macros_names: set[str] | None = None
 		"""All closed tags (eg: div, span, ...)"""
 		self._all_closed_tags_names: set[str] | None = None
+		"""Passages whose blocks are not closed properly: (level at the end, lowest level)"""
+		self._all_unbalanced_passages: dict[str, tuple[int, int]] | None = None
 
 	""" Story """
 	def get_all_filepaths(self) -> Iterator[Path]:
@@ -71,42 +88,19 @@ class Twee3Parser(Parser):
 		if not self.game_root.exists():
 			self.logger.error(f"Game root does not exist: {self.game_root}")
 			raise GameRootNotExistException
-		self.all_filepaths = get_all_filepaths(self.suffix, self.game_root)
+		self.all_filepaths = list(get_all_filepaths(self.suffix, self.game_root))
 		return self.all_filepaths
 
 	""" Passage """
 	def get_all_passages_info(self) -> tuple[list[PassageModel], dict[str, PassageModel]]:
 		"""Get all passages' info from twinescript files."""
-		all_passages: list[PassageModel] = []
-		all_filepaths = self.all_filepaths or self.get_all_filepaths()
-		# 以每个段落标题前一位置的换行作为分割符
-		passage_head_pattern = re.compile(rf"\n(?={Patterns.PassageHead.value.pattern})")
-		passage_head_strip_pattern = re.compile(rf"^{Patterns.PassageHead.value.pattern}")
-
-		for filepath in all_filepaths:
-			all_passages = self._get_passage_info(filepath, all_passages, passage_head_pattern, passage_head_strip_pattern)
-
+		all_passages: list[PassageModel] = list(self.iter_passages())
 		if not all_passages:
 			self.all_passages = []
 			# self.all_passages_by_passage = {}
 			self.logger.warning("0 passages found x-x.")
 			return [], {}
 
-		""" Temporarily saved. """
-		with Session(ENGINE) as session:
-			session.add_all(
-				PassageModelTable(
-					filepath=passage_model.filepath.__str__(),
-					title=passage_model.title,
-					tag=passage_model.tag,
-					body=passage_model.body,
-					length=passage_model.length,
-					widgets=[_.model_dump(mode="json") for _ in passage_model.widgets],
-				)
-				for passage_model in all_passages
-			)
-			session.commit()
-
 		all_passages_by_passage = {
 			passage_model.title: passage_model
 			for passage_model in all_passages
@@ -148,10 +142,70 @@ class Twee3Parser(Parser):
 		_debug_output()
 		return all_passages, all_passages_by_passage
 
-	def _get_passage_info(self, filepath: Path, all_passages: list[PassageModel], passage_head_pattern: re.Pattern, passage_head_strip_pattern: re.Pattern) -> list[PassageModel]:
-		with open(filepath, "r", encoding="utf-8") as fp:
-			content = fp.read()
+	def iter_passages(self) -> Iterator[PassageModel]:
+		"""
+		Yield passages file by file, writing them into database meanwhile.
+
+		段落本身交给调用方，不在此保留；产出完毕后才写入其中的 widget，并记下各段落的主键 (all_passages_ids)。
+		同一次解析中文件、段落只写入一次：已记下主键时只读取、产出段落。
+		"""
+		all_filepaths = list(self.all_filepaths or self.get_all_filepaths())
+		if self.all_passages_ids is not None:
+			for _, passages in self._iter_files_passages(all_filepaths):
+				yield from passages
+			return
+
+		files_ids = self._insert_files(all_filepaths)
+		passages_count = 0
+		widgets_rows: list[tuple[int, dict]] = []  # (段落序号, widget 的各列)
+		# 段落在读取、分割下一个文件的同时写入数据库
+		with BatchWriter(PassageModelTable, returning_ids=True) as writer:
+			for _, passages in self._iter_files_passages(all_filepaths):
+				writer.write(
+					dict(
+						run_id=self.run_id,
+						file_id=files_ids[passage_model.filepath.__str__()],
+						title=passage_model.title,
+						tag=passage_model.tag,
+						body=passage_model.body,
+						length=passage_model.length,
+					)
+					for passage_model in passages
+				)
+				for passage_model in passages:
+					widgets_rows.extend(
+						(passages_count, dict(name=widget.name, pos_start=widget.pos_start, pos_end=widget.pos_end, length=widget.length))
+						for widget in passage_model.widgets
+					)
+					passages_count += 1
+				yield from passages
+
+		if self.cache is not None:
+			self.cache.evict(str(filepath.relative_to(self.game_root)) for filepath in all_filepaths)
+			self.cache.save()
+
+		passages_ids = writer.ids
+		insert_rows(WidgetModelTable, (
+			dict(run_id=self.run_id, passage_id=passages_ids[idx], **row)
+			for idx, row in widgets_rows
+		))
+		self.all_passages_ids = passages_ids
+
+	def _iter_files_passages(self, all_filepaths: list[Path]) -> Iterator[tuple[Path, list[PassageModel]]]:
+		"""逐个文件读取、分割出段落 (未改动的文件取缓存)，不写入数据库"""
+		# 以每个段落标题前一位置的换行作为分割符
+		passage_head_pattern = re.compile(rf"\n(?={Patterns.PassageHead.value.pattern})")
+		passage_head_strip_pattern = re.compile(rf"^{Patterns.PassageHead.value.pattern}")
+		for filepath in all_filepaths:
+			with open(filepath, "r", encoding="utf-8") as fp:
+				content = fp.read()
+
+			if (passages := self._get_cached_passages(filepath, content)) is None:
+				passages = self._get_passage_info(filepath, content, [], passage_head_pattern, passage_head_strip_pattern)
+				self._set_cached_passages(filepath, content, passages)
+			yield filepath, passages
 
+	def _get_passage_info(self, filepath: Path, content: str, all_passages: list[PassageModel], passage_head_pattern: re.Pattern, passage_head_strip_pattern: re.Pattern) -> list[PassageModel]:
 		# Some files are blank
 		if not content:
 			return all_passages
@@ -190,114 +244,322 @@ class Twee3Parser(Parser):
 		return all_passages
 
 	""" Element """
-	def get_all_elements_info(self, *, is_old_macro: bool = False) -> tuple[list[ElementModel], dict[str, list[ElementModel]]]:
-		"""Split each passage into basic elements."""
-		all_elements: list[ElementModel] = []
-		all_passages = self.all_passages or self.get_all_passages_info()[0]
-		patterns = {Patterns.Comment, Patterns.MacroOld, Patterns.Tag} if is_old_macro else {Patterns.Comment, Patterns.Macro, Patterns.Tag}
-
-		for passage in all_passages:
-			all_elements = self._get_element_info(passage, patterns, all_elements)
-
-		all_elements_by_passage: dict[str, list[ElementModel]] = defaultdict(list)
-		for element in all_elements:
-			all_elements_by_passage[element.passage].append(element)
-		all_elements_by_passage = dict(all_elements_by_passage)
-
-		self.all_closed_macros_names = self._get_all_closed_macros(all_elements)
-		self.all_closed_tags_names = self._get_all_closed_tags(all_elements)
-		all_elements, all_elements_by_passage = self._reclassify_elements(all_elements_by_passage, self.all_closed_macros_names, self.all_closed_tags_names)
-
-		""" Temporarily saved. """
-		with Session(ENGINE) as session:
-			session.add_all(
-				ElementModelTable(
-					filepath=element_model.filepath.__str__(),
-					passage=element_model.passage,
-					widget=element_model.widget,
-					block=element_model.block,
-					block_name=element_model.block_name,
-					block_semantic_key=element_model.block_semantic_key,
-					block_semantic_key_hash=element_model.block_semantic_key_hash,
-					type=element_model.type,
-					body=element_model.body,
-					arguments=element_model.arguments,
-					pos_start=element_model.pos_start,
-					pos_end=element_model.pos_end,
-					length=element_model.length,
-					level=element_model.level,
-				)
-				for element_model in all_elements
-			)
-			session.commit()
+	def get_all_elements_info(self, *, is_old_macro: bool = False, max_workers: int | None = 1) -> tuple[list[ElementModel], dict[str, list[ElementModel]]]:
+		"""
+		Split each passage into basic elements.
 
-		self.all_elements = all_elements
-		self.all_elements_by_passage = all_elements_by_passage
-		self.logger.success(f"{len(self.all_elements)} elements found.")
+		`max_workers` 见 `iter_elements`。
+		即 `get_all_elements_stores` 的结果转换为 `ElementModel`，全部元素各建一个模型，内存占用是列式保存的数倍；
+		只在解析器内部使用时直接用 `get_all_elements_stores`。
+		"""
+		all_elements_stores = self.get_all_elements_stores(is_old_macro=is_old_macro, max_workers=max_workers)
+		all_elements_by_passage: dict[str, list[ElementModel]] = {passage: elements.to_models() for passage, elements in all_elements_stores.items()}
+		all_elements: list[ElementModel] = [element for elements in all_elements_by_passage.values() for element in elements]
+		return all_elements, all_elements_by_passage
+
+	def get_all_elements_stores(self, *, is_old_macro: bool = False, max_workers: int | None = 1) -> dict[str, ElementStore]:
+		"""
+		Split each passage into basic elements, stored column by column for each passage, indexed by passage title.
+
+		即 `iter_elements(low_memory=False)` 的结果全部收集起来。逐行读取用 `ElementView`，
+		其字段每次读取都要经过一次 Python 层的属性访问，比 `ElementModel` 的普通属性慢数倍，
+		大量逐行读取时宜先用 `ElementStore.column` 整列取出。
+		"""
+		all_elements_stores: dict[str, ElementStore] = {
+			elements.passage: elements
+			for elements in self.iter_elements(is_old_macro=is_old_macro, max_workers=max_workers, low_memory=False)
+		}
+		self.all_elements_stores = all_elements_stores
+		self.logger.success(f"{sum(map(len, all_elements_stores.values()))} elements found.")
 
 		"""Debug texts, no actual use."""
-		self.logger.debug(f"maximum length: {max(_.length for _ in all_elements)}")
-		self.logger.debug(f"minimum length: {min(_.length for _ in all_elements)}")
-		return all_elements, all_elements_by_passage
+		self.logger.debug(f"maximum length: {max(_.length for elements in all_elements_stores.values() for _ in elements)}")
+		self.logger.debug(f"minimum length: {min(_.length for elements in all_elements_stores.values() for _ in elements)}")
+		return all_elements_stores
+
+	def iter_elements(self, *, is_old_macro: bool = False, max_workers: int | None = 1, low_memory: bool = False) -> Iterator[ElementStore]:
+		"""
+		Yield elements passage by passage in order as soon as they are reclassified, writing them into database meanwhile.
+
+		重分类依赖全部段落中出现过的需闭合的 macro / tag 名称，因此须先看过所有段落：
+		- `low_memory` 为 False (默认) 时一次提取全部段落的元素并保留在内存中，`max_workers` 仅在此时生效。
+		- 为 True 时按文件分两遍：第一遍写入段落、提取元素、收集闭合名称，元素随即丢弃 (开启缓存时存入缓存)；
+		  第二遍重新读取、提取 (或取缓存) 后重分类、产出。同一时刻内存中只有一个文件的段落和元素，
+		  代价是不开缓存时每个段落要提取两遍，只在内存确实不够时使用。
+
+		闭合名称、不闭合的段落等属性在产出完毕后才完整；`all_elements_stores` 只由 `get_all_elements_stores` 设置。
+		"""
+		lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+		try:
+			if low_memory:
+				yield from self._iter_elements_by_file(lexer, is_old_macro)
+			else:
+				yield from self._iter_elements_in_memory(lexer, is_old_macro, max_workers)
+		finally:
+			# 调用方提前停止迭代或出错时也执行，为本次解析已写入数据库的元素建索引
+			if settings.database.fts:
+				index_elements(self.run_id)
+
+	def _iter_elements_in_memory(self, lexer: Patterns, is_old_macro: bool, max_workers: int | None) -> Iterator[ElementStore]:
+		all_passages = self.all_passages or self.get_all_passages_info()[0]
+
+		# 未改动的文件直接取缓存，其余段落重新提取
+		results = self._get_cached_elements(all_passages, is_old_macro)
+		missing = [idx for idx, elements in enumerate(results) if elements is None]
+		if max_workers == 1:
+			for idx in missing:
+				results[idx] = self._get_element_info(all_passages[idx], lexer)
+		else:
+			missing_passages = [all_passages[idx] for idx in missing]
+			for idx, elements in zip(missing, self._map_in_chunks(self._get_elements_info_chunk, missing_passages, [_.length for _ in missing_passages], max_workers, lexer)):
+				results[idx] = self._share_source(elements, all_passages[idx].body)
+		self._set_cached_elements(all_passages, results, missing, is_old_macro)
+		if self.cache is not None:
+			self.cache.save()
+
+		self.all_closed_macros_names = self._get_all_closed_macros(element for elements in results for element in elements)
+		self.all_closed_tags_names = self._get_all_closed_tags(element for elements in results for element in elements)
+		# 各段落重分类完成后即交给写入线程；并行时按完成顺序写入，仍按段落顺序产出
+		reclassified_results = start_pool(self._reclassify_elements(results, self.all_closed_macros_names, self.all_closed_tags_names, max_workers=max_workers))
+		reclassified: dict[int, ElementStore] = {}
+		next_idx = 0
+		with BatchWriter(ElementModelTable) as writer:
+			for idx, elements in reclassified_results:
+				writer.write(self._get_element_rows(elements, idx))
+				reclassified[idx] = elements
+				while next_idx in reclassified:
+					yield reclassified.pop(next_idx)
+					next_idx += 1
+
+	def _iter_elements_by_file(self, lexer: Patterns, is_old_macro: bool) -> Iterator[ElementStore]:
+		all_filepaths = list(self.all_filepaths or self.get_all_filepaths())
+
+		"""第一遍：写入段落 (已读取过全部段落时沿用)，收集闭合名称"""
+		all_closed_macros_names: set[str] = set()
+		all_closed_tags_names: set[str] = set()
+		passages_by_file = (list(passages) for _, passages in groupby(self.all_passages or self.iter_passages(), key=attrgetter("filepath")))
+		for elements in self._iter_lexed_elements(passages_by_file, lexer, is_old_macro):
+			all_closed_macros_names |= self._get_all_closed_macros(elements)
+			all_closed_tags_names |= self._get_all_closed_tags(elements)
+		if self.cache is not None:
+			self.cache.save()
+		self.all_closed_macros_names = all_closed_macros_names
+		self.all_closed_tags_names = all_closed_tags_names
+
+		"""第二遍：重分类，逐个段落写入、产出"""
+		passages_by_file = (passages for _, passages in self._iter_files_passages(all_filepaths))
+		with BatchWriter(ElementModelTable) as writer:
+			for idx, elements in self._reclassify_elements(self._iter_lexed_elements(passages_by_file, lexer, is_old_macro), all_closed_macros_names, all_closed_tags_names):
+				writer.write(self._get_element_rows(elements, idx))
+				yield elements
+
+	def _iter_lexed_elements(self, passages_by_file: Iterable[list[PassageModel]], lexer: Patterns, is_old_macro: bool) -> Iterator[ElementStore]:
+		"""逐个文件提取各段落的元素 (未改动的文件取缓存)，处理完即丢掉该文件的缓存条目"""
+		for passages in passages_by_file:
+			if not passages:
+				continue
+			results = self._get_cached_elements(passages, is_old_macro)
+			missing = [idx for idx, elements in enumerate(results) if elements is None]
+			for idx in missing:
+				results[idx] = self._get_element_info(passages[idx], lexer)
+			self._set_cached_elements(passages, results, missing, is_old_macro)
+			self._cache_entries.pop(str(passages[0].filepath), None)
+			yield from results
+
+	def _get_element_rows(self, elements: ElementStore, idx: int) -> Iterator[dict]:
+		"""该段落 (全部段落中的第 idx 个) 的元素写入数据库时的各行，段落须已写入本次解析"""
+		if self.all_passages_ids is None or idx >= len(self.all_passages_ids):
+			raise PassageNotWrittenException(str(elements.filepath), elements.passage)
+		return elements.to_rows(run_id=self.run_id, passage_id=self.all_passages_ids[idx])
+
+	def update_passage(self, passage: PassageModel, *, is_old_macro: bool = False) -> ElementStore:
+		"""
+		Re-parse a single changed passage in memory.
+
+		各段落的层数、块相互独立，其他段落无需重新处理；需闭合的 macro / tag 名称沿用全量解析时的结果，
+		若该段落引入了新的闭合名称，会给出警告，此时其他段落可能需要全量重新解析。
+		"""
+		all_elements_stores = self.all_elements_stores or self.get_all_elements_stores(is_old_macro=is_old_macro)
+		lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+		elements = self._get_element_info(passage, lexer)
+
+		new_closed_macros_names = self._get_all_closed_macros(elements) - self.all_closed_macros_names
+		new_closed_tags_names = self._get_all_closed_tags(elements) - self.all_closed_tags_names
+		if new_closed_macros_names or new_closed_tags_names:
+			self.logger.warning(f"'{passage.title}' introduces new closed blocks {new_closed_macros_names | new_closed_tags_names}, other passages may be stale.")
+			self.all_closed_macros_names |= new_closed_macros_names
+			self.all_closed_tags_names |= new_closed_tags_names
+
+		elements, level_end, level_lowest = self._reclassify_passage_elements(elements, self.all_closed_macros_names, self.all_closed_tags_names)
+		self.all_unbalanced_passages.pop(passage.title, None)
+		if level_end or level_lowest < 0:
+			self.all_unbalanced_passages[passage.title] = (level_end, level_lowest)
+
+		all_elements_stores[passage.title] = elements
+		self.all_passages = [passage if _.title == passage.title else _ for _ in self.all_passages]
+		self.all_passages_by_passage = {**self.all_passages_by_passage, passage.title: passage}
+		return elements
+
+	""" Cache """
+	def _get_cached_passages(self, filepath: Path, content: str) -> list[PassageModel] | None:
+		"""文件内容未改变时，返回缓存的段落"""
+		if self.cache is None:
+			return None
+		relative_filepath = str(filepath.relative_to(self.game_root))
+		content_hash = self.cache.hash_content(content)
+		entry = self.cache.get(relative_filepath, content_hash)
+		self._cache_entries[relative_filepath] = (content_hash, entry or {})
+		return entry["passages"] if entry else None
+
+	def _set_cached_passages(self, filepath: Path, content: str, passages: list[PassageModel]) -> None:
+		if self.cache is None:
+			return
+		relative_filepath = str(filepath.relative_to(self.game_root))
+		content_hash = self.cache.hash_content(content)
+		entry = {"passages": passages, "is_old_macro": None, "elements": None}
+		self.cache.set(relative_filepath, content_hash, entry)
+		self._cache_entries[relative_filepath] = (content_hash, entry)
+
+	def _get_cached_elements(self, all_passages: list[PassageModel], is_old_macro: bool) -> list[ElementStore | None]:
+		"""
+		按段落返回缓存的元素 (重分类之前的)，没有缓存的为 None。
+		缓存的元素用过一次就丢掉，因为重分类会原地修改元素。
+		"""
+		results: list[ElementStore | None] = [None] * len(all_passages)
+		if self.cache is None:
+			return results
+
+		idx_in_file: dict[str, int] = defaultdict(int)
+		for idx, passage in enumerate(all_passages):
+			relative_filepath = str(passage.filepath)
+			_, entry = self._cache_entries.get(relative_filepath, (None, {}))
+			if entry.get("elements") is not None and entry["is_old_macro"] == is_old_macro:
+				results[idx] = entry["elements"][idx_in_file[relative_filepath]]
+			idx_in_file[relative_filepath] += 1
+
+		for _, entry in self._cache_entries.values():
+			entry["elements"] = None
+		self.logger.debug(f"{len(all_passages) - results.count(None)}/{len(all_passages)} passages' elements loaded from cache.")
+		return results
+
+	def _set_cached_elements(self, all_passages: list[PassageModel], results: list[ElementStore], missing: list[int], is_old_macro: bool) -> None:
+		"""将重新提取的元素按文件写入缓存，须在重分类之前调用；之后由调用方 save"""
+		if self.cache is None or not missing:
+			return
+
+		elements_by_file: dict[str, list[ElementStore]] = defaultdict(list)
+		for passage, elements in zip(all_passages, results):
+			elements_by_file[str(passage.filepath)].append(elements)
+
+		for relative_filepath in dict.fromkeys(str(all_passages[idx].filepath) for idx in missing):
+			content_hash, entry = self._cache_entries[relative_filepath]
+			self.cache.set(relative_filepath, content_hash, {
+				"passages": entry["passages"],
+				"is_old_macro": is_old_macro,
+				"elements": elements_by_file[relative_filepath],
+			})
+
+	def _map_in_chunks(self, func: Callable[..., list], items: list, weights: list[int], max_workers: int | None, *args) -> list:
+		"""
+		按权重将 items 分组，交给进程池以 `func(chunk, *args)` 处理，再按 items 原顺序拼回。
+		`func` 须为可被子进程导入的静态方法，对组内每一项返回一个结果。
+		"""
+		results: list = [None] * len(items)
+		for idx, result in self._imap_in_chunks(func, items, weights, max_workers, *args):
+			results[idx] = result
+		return results
+
+	def _imap_in_chunks(self, func: Callable[..., list], items: list, weights: list[int], max_workers: int | None, *args) -> Iterator[tuple]:
+		"""同 `_map_in_chunks`，但每组完成后即逐个产出 (下标, 结果)，顺序为完成顺序"""
+		max_workers = get_workers_count(max_workers)
+		chunks = self._chunk_by_weight(weights, max_workers * 4)
+		with ProcessPoolExecutor(max_workers=max_workers) as executor:
+			futures = {
+				executor.submit(func, [items[idx] for idx in chunk], *args): chunk
+				for chunk in chunks
+			}
+			for future in as_completed(futures):
+				yield from zip(futures[future], future.result())
+		self.logger.debug(f"{len(items)} items processed in {len(chunks)} chunks by {max_workers} workers.")
+
+	@staticmethod
+	def _get_elements_info_chunk(passages: list[PassageModel], lexer: Patterns) -> list[ElementStore]:
+		"""Run in worker process, return elements of each passage separately."""
+		return [Twee3Parser._get_element_info(passage, lexer) for passage in passages]
+
+	@staticmethod
+	def _reclassify_elements_chunk(elements_list: list[ElementStore], all_closed_macros_names: set[str], all_closed_tags_names: set[str]) -> list[tuple[ElementStore, int, int]]:
+		"""Run in worker process, reclassify elements of each passage separately."""
+		return [
+			Twee3Parser._reclassify_passage_elements(elements, all_closed_macros_names, all_closed_tags_names)
+			for elements in elements_list
+		]
 
-	def _get_element_info(self, passage: PassageModel, patterns: set[Patterns], all_elements: list[ElementModel]) -> list[ElementModel]:
-		filepath = passage.filepath
-		title = passage.title
+	@staticmethod
+	def _share_source(elements: ElementStore, source: str) -> ElementStore:
+		"""子进程返回的元素带着一份段落主体的副本，换回主进程中的同一个字符串"""
+		elements.source = source
+		return elements
+
+	@staticmethod
+	def _chunk_by_weight(weights: list[int], chunks_count: int) -> list[list[int]]:
+		"""
+		最长处理时间优先 (LPT)：按权重 (如段落长度) 从大到小，依次放进当前总权重最小的组。
+		少数超长的 widget 段落各自独占一组，大量短段落填进剩余的组，各组总权重大致相同。
+		返回各组中的下标，总权重大的组排在前面，先提交。
+		"""
+		chunks_count = max(1, min(chunks_count, len(weights)))
+		chunks: list[list[int]] = [[] for _ in range(chunks_count)]
+		loads: list[tuple[int, int]] = [(0, idx) for idx in range(chunks_count)]  # (总权重, 组下标) 小根堆
+		for idx in sorted(range(len(weights)), key=lambda _: weights[_], reverse=True):
+			load, chunk_idx = heapq.heappop(loads)
+			chunks[chunk_idx].append(idx)
+			heapq.heappush(loads, (load + max(weights[idx], 1), chunk_idx))
+		loads_by_chunk = {chunk_idx: load for load, chunk_idx in loads}
+		return [
+			chunks[chunk_idx]
+			for chunk_idx in sorted(range(chunks_count), key=lambda _: loads_by_chunk[_], reverse=True)
+			if chunks[chunk_idx]
+		]
+
+	@staticmethod
+	def _get_element_info(passage: PassageModel, lexer: Patterns) -> ElementStore:
 		body = passage.body
-		widget_flag = bool(passage.widgets)
 
 		"""special passage: [script]"""
 		if passage.tag and passage.tag.lower() == "script":
-			all_elements.append(ElementModel(
-				filepath=filepath,
-				passage=title,
-				type=Patterns.JavaScript.name,
-				body=body,
-				pos_start=0,
-				pos_end=len(body),
-				length=len(body),
-			))
-			return all_elements
+			elements_found = ElementStore(passage.filepath, passage.title, body)
+			elements_found.append(Patterns.JavaScript.name, 0, len(body))
+			return elements_found
 
-		elements_found: list[ElementModel] = []
 		"""Elements have clear definition."""
-		for pattern in patterns:
-			for match in re.finditer(pattern.value, body):
-				element = ElementModel(
-					filepath=filepath,
-					passage=title,
-					type=pattern.name,
-					body=match.group(),
-					pos_start=match.start(),
-					pos_end=match.end(),
-					length=match.end() - match.start(),
-				)
-				if pattern != Patterns.Comment:  # Macro / Tag
-					element.arguments = match.groups()[1]
-				if widget_flag:
-					for widget in passage.widgets:
-						if match.start() >= widget.pos_start and match.end() <= widget.pos_end:
-							element.widget = widget.name
-							break
-				elements_found.append(element)
+		widgets = IntervalIndex((widget.pos_start, widget.pos_end) for widget in passage.widgets)
+		elements_found = Twee3Parser._lex_elements(passage, lexer, widgets)
 
 		if not elements_found:
-			elements_found.append(ElementModel(
-				filepath=filepath,
-				passage=title,
-				type=Patterns.PlainText.name,
-				body=body,
-				pos_start=0,
-				pos_end=len(body),
-				length=len(body),
-			))
+			elements_found.append(Patterns.PlainText.name, 0, len(body))
 
-		elements_found = self._sort_elements(elements_found)
-		elements_found = self._filter_elements_inside_another(elements_found)
-		elements_found = self._fill_plaintexts(elements_found, filepath, body, passage, widget_flag)
-		elements_found = self._merge_elements_inside_script(elements_found)
-		all_elements.extend(elements_found)
-		return all_elements
+		elements_found = Twee3Parser._fill_plaintexts(elements_found, passage, widgets)
+		elements_found = Twee3Parser._merge_elements_inside_script(elements_found)
+		return elements_found
+
+	@staticmethod
+	def _lex_elements(passage: PassageModel, lexer: Patterns, widgets: IntervalIndex) -> ElementStore:
+		"""
+		单次扫描段落主体，按顺序得到所有 comment / macro / tag。
+		合并后的正则从上一个元素结尾处继续匹配，因此不会出现被其他元素包裹住的元素，无需再排序、过滤。
+		"""
+		pattern = lexer.value
+		elements_found = ElementStore(passage.filepath, passage.title, passage.body)
+		for match in pattern.finditer(passage.body):
+			type_ = match.lastgroup
+			pos_start, pos_end = match.span()
+			elements_found.append(
+				type_, pos_start, pos_end,
+				arguments=match.group(pattern.groupindex[type_] + 2) if type_ != Patterns.Comment.name else None,  # Macro / Tag
+				widget=Twee3Parser._find_widget(passage, widgets, pos_start, pos_end) if widgets else None,
+			)
+		return elements_found
 
 	""" Merge """  # TODO
 	# def merge_elements(self, length_limit: int = 10000, lines_limit: int = 50):
@@ -700,92 +962,36 @@ class Twee3Parser(Parser):
 		return result
 
 	@staticmethod
-	def _sort_elements(elements: list[ElementModel]) -> list[ElementModel]:
-		"""Sort elements based on position."""
-		return sorted(elements, key=lambda elem: elem.pos_start)
+	def _sort_elements(elements: ElementStore) -> list[int]:
+		"""Sort elements based on position, return their indexes."""
+		return sorted(range(len(elements)), key=elements.column("pos_start").__getitem__)
 
 	@staticmethod
-	def _filter_elements_inside_another(elements: list[ElementModel | None]) -> list[ElementModel]:
-		"""因为按照正则提取，有些在某一元素里的另一元素被当做独立元素抓出来了，把这部分内容去掉"""
-		elements_copy = elements.copy()
-		for idx, element in enumerate(elements_copy):
-			for i in range(len(elements_copy) - idx):
-				if i == 0:
-					continue
-				# 因为按照 pos_start 排序过了，所以被包裹住的元素开头一定在当前元素开头的后面
-				# 因此当出现后者开头小于当前元素结尾时，后者是被当前元素包裹住的元素
-				if elements_copy[idx+i].pos_start < element.pos_end:
-					elements[idx+i] = None
-
-		return list(filter(lambda _: _ is not None, elements))
+	def _fill_plaintexts(elements: ElementStore, passage: PassageModel, widgets: IntervalIndex) -> ElementStore:
+		"""经过处理后，夹在两个元素之间的就是纯文本；一次扫描，顺带去掉被包裹住的元素"""
+		result = ElementStore(passage.filepath, passage.title, passage.body)
+		order = Twee3Parser._sort_elements(elements)
+		pos_starts, pos_ends = elements.column("pos_start"), elements.column("pos_end")
+		spans = ((pos_starts[idx], pos_ends[idx]) for idx in order)
+		for pos_start, pos_end, idx in IntervalIndex.partition(spans, len(passage.body)):
+			if idx != -1:
+				result.append_from(elements[order[idx]])
+				continue
 
-	@staticmethod
-	def _fill_plaintexts(elements: list[ElementModel], filepath: Path, content: str, passage: PassageModel, widget_flag: bool) -> list[ElementModel]:
-		"""经过处理后，夹在两个元素之间的就是纯文本"""
-		elements_copy = elements.copy()
-		for idx, element in enumerate(elements_copy):
-			"""向前判断一次"""
-			# 在开头之前可能有纯文本
-			if idx == 0 and element.pos_start > 0:
-				text = content[:element.pos_start]
-				pos_start = 0
-				pos_end = element.pos_start
-				element_ = ElementModel(
-					filepath=filepath,
-					passage=passage.title,
-					type=Patterns.PlainText.name,
-					body=text,
-					pos_start=pos_start,
-					pos_end=pos_end,
-					length=pos_end - pos_start,
-				)
-				if widget_flag:
-					for widget in passage.widgets:
-						if pos_start >= widget.pos_start and pos_end <= widget.pos_end:
-							element_.widget = widget.name
-							break
-				elements.insert(0, element_)
-
-			"""向后判断一次"""
-			# 非开头 非末尾
-			if idx < len(elements_copy) - 1:
-				# 前后两元素中间没有内容
-				if element.pos_end == elements_copy[idx+1].pos_start:
-					continue
-
-				text = content[element.pos_end:elements_copy[idx+1].pos_start]
-				pos_end = elements_copy[idx+1].pos_start
-
-			# 在末尾之后可能有纯文本
-			else:
-				# 元素末尾就是段落末尾
-				if element.pos_end >= len(content):
-					continue
-
-				text = content[element.pos_end:]
-				pos_end = len(content)
-
-			pos_start = element.pos_end
-			element_ = ElementModel(
-				filepath=filepath,
-				passage=passage.title,
-				type=Patterns.PlainText.name,
-				body=text,
-				pos_start=pos_start,
-				pos_end=pos_end,
-				length=pos_end - pos_start,
+			result.append(
+				Patterns.PlainText.name, pos_start, pos_end,
+				widget=Twee3Parser._find_widget(passage, widgets, pos_start, pos_end) if widgets else None,
 			)
-			if widget_flag:
-				for widget in passage.widgets:
-					if pos_start >= widget.pos_start and pos_end <= widget.pos_end:
-						element_.widget = widget.name
-						break
-			elements.insert(idx+1, element_)
-		"""Sort again, including plain-text elements"""
-		return Twee3Parser._sort_elements(elements)
+		return result
+
+	@staticmethod
+	def _find_widget(passage: PassageModel, widgets: IntervalIndex, pos_start: int, pos_end: int) -> str | None:
+		"""二分查找包裹该位置的 widget"""
+		idx = widgets.find_enclosing(pos_start, pos_end)
+		return passage.widgets[idx].name if idx != -1 else None
 
 	@staticmethod
-	def _merge_elements_inside_script(elements: list[ElementModel], block_start: str = "<<script>>", block_end: str = "<</script>>") -> list[ElementModel]:
+	def _merge_elements_inside_script(elements: ElementStore, block_start: str = "<<script>>", block_end: str = "<</script>>") -> ElementStore:
 		"""
 		<<script>>...<</script>>
 		之中的内容统一判断为 JAVASCRIPT
@@ -793,57 +999,44 @@ class Twee3Parser(Parser):
 		<script>...</script>
 		也是
 		"""
-		result: list[ElementModel] = []
-		filepath = elements[0].filepath
-		passage = elements[0].passage
+		if block_start not in elements.source:
+			return elements
+
+		result = ElementStore(elements.filepath, elements.passage, elements.source)
 		type_ = Patterns.JavaScript.name
 		pos_start = -1
-		body = ""
 
 		inside = False
 		for element in elements:
 			if not inside:  # <<script>> / <script> ，及其它元素
-				result.append(element)
+				result.append_from(element)
 			elif element.body == block_end:
 				inside = False
-				result.extend((
-					ElementModel(
-						filepath=filepath,
-						passage=passage,
-						type=type_,
-						pos_start=pos_start,
-						pos_end=element.pos_start,
-						length=element.pos_start-pos_start,
-						body=body,
-						widget=element.widget
-					),
-					element
-				))
+				result.append(type_, pos_start, element.pos_start, widget=element.widget)
+				result.append_from(element)
 				continue
-			else:  # 二者之间的元素，以及 <</script>> / </script>
-				body = f"{body}{element.body}"
+			else:  # 二者之间的元素，由 <</script>> / </script> 的位置直接截取
 				continue
 
 			if element.body == block_start:
 				inside = True
 				pos_start = element.pos_end
-				body = ""
 		return result
 
 	@staticmethod
-	def _merge_elements_inside_script_macro(elements: list[ElementModel]) -> list[ElementModel]:
+	def _merge_elements_inside_script_macro(elements: ElementStore) -> ElementStore:
 		"""<<script>>...<</script>>"""
 		return Twee3Parser._merge_elements_inside_script(elements)
 
 	@staticmethod
-	def _merge_elements_inside_script_tag(elements: list[ElementModel]) -> list[ElementModel]:
+	def _merge_elements_inside_script_tag(elements: ElementStore) -> ElementStore:
 		"""<script>...</script>"""
 		return Twee3Parser._merge_elements_inside_script(elements, block_start="<script>", block_end="</script>")
 
 	@staticmethod
-	def _get_all_closed_macros(all_elements: list[ElementModel]) -> set[str]:
+	def _get_all_closed_macros(all_elements: Iterable[ElementView]) -> set[str]:
 		"""获取所有在文中出现过的需闭合的 macro | by HCP"""
-		all_macros: list[ElementModel] = list(filter(lambda element: element.type in {Patterns.Macro.name, Patterns.MacroOld.name}, all_elements))
+		all_macros: list[ElementView] = list(filter(lambda element: element.type in {Patterns.Macro.name, Patterns.MacroOld.name}, all_elements))
 
 		"""正常定义的闭合标签 <</macro>>"""
 		return {macro.body.lstrip("<</").rstrip(">>") for macro in all_macros if macro.body.startswith("<</")}
@@ -865,16 +1058,50 @@ class Twee3Parser(Parser):
 		# self.logger.info("|".join(probably_closed_macros_names))
 
 	@staticmethod
-	def _get_all_closed_tags(all_elements: list[ElementModel]) -> set[str]:
+	def _get_all_closed_tags(all_elements: Iterable[ElementView]) -> set[str]:
 		"""获取所有在文中出现过的需闭合的 tags"""
-		all_tags: list[ElementModel] = list(filter(lambda element: element.type == Patterns.Tag.name, all_elements))
+		all_tags: list[ElementView] = list(filter(lambda element: element.type == Patterns.Tag.name, all_elements))
 
 		"""正常定义的闭合标签 </div>"""
 		return {macro.body.lstrip("</").rstrip(">") for macro in all_tags if macro.body.startswith("</")}
 
+	def _reclassify_elements(self, elements_list: Iterable[ElementStore], all_closed_macros_names: set[str], all_closed_tags_names: set[str], *, max_workers: int | None = 1) -> Iterator[tuple[int, ElementStore]]:
+		"""
+		将元素按照“块”、“内容”重分类为两类，并构建语义化键。
+		各段落相互独立 (层数均从 0 开始)，某一段落块不闭合不会影响其他段落；这些段落记录在 `all_unbalanced_passages` 中。
+
+		逐个段落产出 (在 elements_list 中的下标, 重分类后的元素)，并行时为完成顺序；全部产出后才记录不闭合的段落。
+		串行时 elements_list 可以是生成器，并行时须为 list。
+		"""
+		if max_workers == 1:
+			results = (
+				(idx, self._reclassify_passage_elements(elements, all_closed_macros_names, all_closed_tags_names))
+				for idx, elements in enumerate(elements_list)
+			)
+		else:
+			results = (
+				(idx, (self._share_source(elements, elements_list[idx].source), level_end, level_lowest))
+				for idx, (elements, level_end, level_lowest) in self._imap_in_chunks(
+					self._reclassify_elements_chunk, elements_list, [len(_) for _ in elements_list], max_workers, all_closed_macros_names, all_closed_tags_names
+				)
+			)
+
+		all_unbalanced_passages: dict[str, tuple[int, int]] = {}
+		for idx, (elements, level_end, level_lowest) in results:
+			if level_end or level_lowest < 0:
+				all_unbalanced_passages[elements.passage] = (level_end, level_lowest)
+				self.logger.debug(f"'{elements.passage}'块不闭合 - 末尾层数: {level_end}, 最低层数: {level_lowest}")
+			yield idx, elements
+		if all_unbalanced_passages:
+			self.logger.warning(f"{len(all_unbalanced_passages)} passages have unbalanced blocks.")
+		self.all_unbalanced_passages = all_unbalanced_passages
+
 	@staticmethod
-	def _reclassify_elements(all_elements_by_passage: dict[str, list[ElementModel]], all_closed_macros_names: set[str], all_closed_tags_names: set[str]) -> tuple[list[ElementModel], dict[str, list[ElementModel]]]:
-		"""将元素按照“块”、“内容”重分类为两类，并构建语义化键"""
+	def _reclassify_passage_elements(elements: ElementStore, all_closed_macros_names: set[str], all_closed_tags_names: set[str]) -> tuple[ElementStore, int, int]:
+		"""
+		重分类单个段落的元素，层数从 0 开始。
+		返回 (元素, 末尾层数, 最低层数)，块闭合正常时后两者均为 0。
+		"""
 		"""
 		{PassageName}
 		||
@@ -883,96 +1110,84 @@ class Twee3Parser(Parser):
 		{BlockType}::{BlockName}[{BlockIndex}]
 		...
 		"""
-		_keys = defaultdict(list)
-		global_level: int = 0
-		for passage_name, elements in all_elements_by_passage.items():
-			for idx, element in enumerate(elements):
-				match element.type:
-					case Patterns.Macro.name | Patterns.MacroOld.name:
-						macro_name = Patterns.Macro.value.match(element.body).groups()[0] if element.type == Patterns.Macro.name else Patterns.MacroOld.value.match(element.body).groups()[0]
-						macro_name_open = macro_name.lstrip("/")
-						if macro_name_open in all_closed_macros_names:
-							if macro_name == macro_name_open:
-								all_elements_by_passage[passage_name][idx].block = ModelField.MacroBlockHead.name
-								global_level += 1
-							else:
-								all_elements_by_passage[passage_name][idx].block = ModelField.MacroBlockTail.name
-								all_elements_by_passage[passage_name][idx].level = global_level  # 先记录层数再减
-								global_level -= 1
-							all_elements_by_passage[passage_name][idx].block_name = macro_name_open
-
-					case Patterns.Tag.name:
-						tag_name, _, is_tag_self_close = Patterns.Tag.value.match(element.body).groups()
-						tag_name_open = tag_name.lstrip("/")
-
-						# 有些特殊 tag 既能自闭也能不自闭，如 <image>
-						is_tag_self_close = bool(is_tag_self_close)
-						if tag_name_open in all_closed_tags_names:
-							if tag_name == tag_name_open:
-								if not is_tag_self_close:
-									all_elements_by_passage[passage_name][idx].block = ModelField.TagBlockHead.name
-									global_level += 1
-							else:
-								all_elements_by_passage[passage_name][idx].block = ModelField.TagBlockTail.name
-								all_elements_by_passage[passage_name][idx].level = global_level  # 先记录层数再减
-								global_level -= 1
-							all_elements_by_passage[passage_name][idx].block_name = tag_name_open
-				# 层数
-				all_elements_by_passage[passage_name][idx].level = global_level if all_elements_by_passage[passage_name][idx].level == -1 else all_elements_by_passage[passage_name][idx].level
-
-				# 构建语义化键：
-				all_elements_by_passage = Twee3Parser._build_semantic_keys(all_elements_by_passage, passage_name, idx)
-
-		all_elements = []
-		for elements in all_elements_by_passage.values():
-			all_elements.extend(elements)
-		return all_elements, all_elements_by_passage
+		level: int = 0
+		level_lowest: int = 0
+		for element in elements:
+			match element.type:
+				case Patterns.Macro.name | Patterns.MacroOld.name:
+					macro_name = Patterns.Macro.value.match(element.body).groups()[0] if element.type == Patterns.Macro.name else Patterns.MacroOld.value.match(element.body).groups()[0]
+					macro_name_open = macro_name.lstrip("/")
+					if macro_name_open in all_closed_macros_names:
+						if macro_name == macro_name_open:
+							element.block = ModelField.MacroBlockHead.name
+							level += 1
+						else:
+							element.block = ModelField.MacroBlockTail.name
+							element.level = level  # 先记录层数再减
+							level -= 1
+						element.block_name = macro_name_open
+
+				case Patterns.Tag.name:
+					tag_name, _, is_tag_self_close = Patterns.Tag.value.match(element.body).groups()
+					tag_name_open = tag_name.lstrip("/")
+
+					# 有些特殊 tag 既能自闭也能不自闭，如 <image>
+					is_tag_self_close = bool(is_tag_self_close)
+					if tag_name_open in all_closed_tags_names:
+						if tag_name == tag_name_open:
+							if not is_tag_self_close:
+								element.block = ModelField.TagBlockHead.name
+								level += 1
+						else:
+							element.block = ModelField.TagBlockTail.name
+							element.level = level  # 先记录层数再减
+							level -= 1
+						element.block_name = tag_name_open
+			# 层数
+			element.level = level if element.level == -1 else element.level
+			level_lowest = min(level_lowest, level)
+
+		# 构建语义化键：
+		elements = Twee3Parser._build_semantic_keys(elements)
+		return elements, level, level_lowest
 
 	@staticmethod
-	def _build_semantic_keys(all_elements_by_passage: dict[str, list[ElementModel]], passage: str, current_idx: int) -> dict[str, list[ElementModel]]:
-		"""为每个“头”元素构建语义化键"""
-		_current_element: ElementModel = all_elements_by_passage[passage][current_idx]
-		if _current_element.block not in {ModelField.MacroBlockHead.name, ModelField.TagBlockHead.name}:
-			return all_elements_by_passage
-
-		_semantic_key: str = ""
-		_semantic_key_idx: int = 0
-		_have_met_same_level: bool = False
-		# 从当前元素开始倒序向前找，
-		for _result_element in all_elements_by_passage[passage][:current_idx][::-1]:
-			# 仅找块首元素
-			if _result_element.block not in {ModelField.MacroBlockHead.name, ModelField.TagBlockHead.name}:
-				continue
+	def _build_semantic_keys(elements: ElementStore) -> ElementStore:
+		"""
+		为每个“头”元素构建语义化键，单次正向遍历。
 
-			# 遇到层数大的则跳过 (其他块的内部，无关自己的键)，
-			if _result_element.level > _current_element.level:
-				continue
-			# 遇到首个层数小的，则将自己的键添加在对方之后，并跳出 (跳出包裹了)
-			elif _result_element.level < _current_element.level:
-				_semantic_key = f"{_result_element.block_semantic_key}--"
-				break
-
-			# 遇到首个同一层数的，判断名称类型
-			# 遇到首个同一层数且同名同类，则自己的序号为对方的序号+1，此后不再判断同一层数直到跳出
-			# 若始终没遇到首个同一层数，说明该元素块序号是 [0]，无需额外处理
-			if _have_met_same_level:
+		栈中存放可能包裹后续块的块首，自底向上层数严格递增：
+		- 遇到新的块首时，先弹出层数不小于它的块首，此时栈顶即包裹它的块 (栈空则直接位于文章之下)
+		- 每个块首 (以及文章本身) 各自记录其下每一层、每种同名同类子块目前的序号，新块首的序号为其 +1，首个为 [0]
+		"""
+		heads = {ModelField.MacroBlockHead.name, ModelField.TagBlockHead.name}
+		stack: list[tuple[ElementView, dict[tuple[int, str, str], int]]] = []
+		passage_siblings: dict[tuple[int, str, str], int] = {}
+		for element in elements:
+			if element.block not in heads:
 				continue
 
-			if _result_element.block_name == _current_element.block_name and _result_element.type == _current_element.type:
-				_have_met_same_level = True
-				_semantic_key_idx = int(_result_element.block_semantic_key.rstrip("]").split("[")[-1]) + 1
+			while stack and stack[-1][0].level >= element.level:
+				stack.pop()
 
-		# 直到遍历完都没有跳出，即该元素为首个块首元素
-		# 添加文章名称头部
-		else:
-			_semantic_key = f"{_current_element.passage}||"
+			if stack:
+				parent, siblings = stack[-1]
+				semantic_key = f"{parent.block_semantic_key}--"
+			else:
+				siblings = passage_siblings
+				semantic_key = f"{element.passage}||"
+
+			sibling = (element.level, element.type, element.block_name)
+			semantic_key_idx = siblings.get(sibling, -1) + 1
+			siblings[sibling] = semantic_key_idx
 
-		# 完整的语义化键
-		# eg: Upgrade Waiting Room||Macro::if<StartConfig.versionName>[0]--Macro::silently<>[1]
-		all_elements_by_passage[passage][current_idx].block_semantic_key = f"{_semantic_key}{_current_element.type}::{_current_element.block_name}<{_current_element.arguments or ''}>[{_semantic_key_idx}]"
-		all_elements_by_passage[passage][current_idx].block_semantic_key_hash = md5(all_elements_by_passage[passage][current_idx].block_semantic_key.encode()).hexdigest() if all_elements_by_passage[passage][current_idx].block_semantic_key else ''
+			# 完整的语义化键
+			# eg: Upgrade Waiting Room||Macro::if<StartConfig.versionName>[0]--Macro::silently<>[1]
+			element.block_semantic_key = f"{semantic_key}{element.type}::{element.block_name}<{element.arguments or ''}>[{semantic_key_idx}]"
+			element.block_semantic_key_hash = md5(element.block_semantic_key.encode()).hexdigest()
+			stack.append((element, {}))
 
-		return all_elements_by_passage
+		return elements
 
 	""" Getters & Setters """
 
@@ -980,6 +1195,10 @@ class Twee3Parser(Parser):
 	def suffix(self) -> str:
 		return self._suffix
 
+	@property
+	def cache(self) -> ParseCache | None:
+		return self._cache
+
 	@property
 	def all_filepaths(self) -> list[Path]:
 		return self._all_filepaths
@@ -1005,20 +1224,34 @@ class Twee3Parser(Parser):
 		self._all_passages_by_passage = passages_by_passage
 
 	@property
-	def all_elements(self) -> list[ElementModel]:
-		return self._all_elements
+	def all_passages_ids(self) -> list[int]:
+		return self._all_passages_ids
 
-	@all_elements.setter
-	def all_elements(self, elements: list[ElementModel]) -> None:
-		self._all_elements = elements
+	@all_passages_ids.setter
+	def all_passages_ids(self, passages_ids: list[int]) -> None:
+		self._all_passages_ids = passages_ids
 
 	@property
-	def all_elements_by_passage(self) -> dict[str, list[ElementModel]]:
-		return self._all_elements_by_passage
+	def all_elements(self) -> list[ElementModel] | None:
+		"""由 `all_elements_stores` 转换而来，每次访问都重新转换"""
+		if self._all_elements_stores is None:
+			return None
+		return [element for elements in self._all_elements_stores.values() for element in elements.to_models()]
 
-	@all_elements_by_passage.setter
-	def all_elements_by_passage(self, elements_by_passage: dict[str, list[ElementModel]]) -> None:
-		self._all_elements_by_passage = elements_by_passage
+	@property
+	def all_elements_by_passage(self) -> dict[str, list[ElementModel]] | None:
+		"""由 `all_elements_stores` 转换而来，每次访问都重新转换"""
+		if self._all_elements_stores is None:
+			return None
+		return {passage: elements.to_models() for passage, elements in self._all_elements_stores.items()}
+
+	@property
+	def all_elements_stores(self) -> dict[str, ElementStore]:
+		return self._all_elements_stores
+
+	@all_elements_stores.setter
+	def all_elements_stores(self, elements_stores: dict[str, ElementStore]) -> None:
+		self._all_elements_stores = elements_stores
 
 	@property
 	def all_closed_macros_names(self) -> set[str]:
@@ -1036,6 +1269,14 @@ class Twee3Parser(Parser):
 	def all_closed_tags_names(self, tags_names: set[str]) -> None:
 		self._all_closed_tags_names = tags_names
 
+	@property
+	def all_unbalanced_passages(self) -> dict[str, tuple[int, int]]:
+		return self._all_unbalanced_passages
+
+	@all_unbalanced_passages.setter
+	def all_unbalanced_passages(self, unbalanced_passages: dict[str, tuple[int, int]]) -> None:
+		self._all_unbalanced_passages = unbalanced_passages
+
 
 # class MacroArgumentParser:
 #     def __init__(self):
@@ -1246,5 +1487,5 @@ if __name__ == '__main__':
 	parser = Twee3Parser()
 	reviewer = Twee3Reviewer()
 	# parser.get_all_passages_info()
-	parser.get_all_elements_info(is_old_macro=True)
+	parser.get_all_elements_stores(is_old_macro=True)
 	reviewer.validate_all_elements()
@@ -1,2 +1,3 @@
+from .checks import *
 from .internal import *
 from .javascript import *
@@ -0,0 +1,147 @@
+"""
+Checks on the elements of one passage, run together by `Twee3Reviewer` in a single pass.
+
+每个段落开始时调用各检查的 `begin`，之后按位置顺序对每个元素调用 `visit`，最后由 `end` 返回该段落的问题，无问题即通过。
+新的检查继承 `ElementCheck`，只需覆盖用到的方法，再加入 Twee3Reviewer 的 `checks` 即可，不会多遍历一次。
+段落、元素只需有下列属性 (数据库中的行或 PassageModel / ElementView 均可)：
+- passage: filepath, title, body, length
+- element: pos_start, pos_end, level, block
+"""
+from typing import Any
+
+from sugarcube2_localization.core.schema.data_model import ReviewIssueModel
+from sugarcube2_localization.core.schema.enum import ModelField
+
+"""问题处原文最多保留的字符数"""
+SNIPPET_LENGTH = 80
+
+
+class ElementCheck:
+    """Base of the checks, keeps the state of the passage being checked."""
+    name: str = ""
+
+    def begin(self, passage: Any) -> None:
+        """重置上一段落留下的状态"""
+
+    def visit(self, passage: Any, element: Any) -> None:
+        """按位置顺序逐个传入元素"""
+
+    def end(self, passage: Any) -> list[ReviewIssueModel]:
+        """该段落的元素均已传入，返回发现的问题"""
+        return []
+
+    def issue(self, passage: Any, message: str, pos_start: int, pos_end: int) -> ReviewIssueModel:
+        """段落中 pos_start ~ pos_end 处的问题"""
+        pos_start, pos_end = sorted((max(pos_start, 0), max(pos_end, 0)))
+        snippet = passage.body[pos_start:pos_end]
+        return ReviewIssueModel(
+            check=self.name,
+            filepath=passage.filepath,
+            passage=passage.title,
+            message=message,
+            pos_start=pos_start,
+            pos_end=pos_end,
+            snippet=snippet if len(snippet) <= SNIPPET_LENGTH else f"{snippet[:SNIPPET_LENGTH]}...",
+        )
+
+
+class OrderCheck(ElementCheck):
+    """顺序，有无遗漏：首元素始于文章开头、末元素止于文章结尾，前后元素首尾相接"""
+    name = "order"
+
+    def begin(self, passage: Any) -> None:
+        self._head_start: int | None = None
+        self._tail_end: int = 0
+        self._gap: tuple[int, int] | None = None
+
+    def visit(self, passage: Any, element: Any) -> None:
+        if self._head_start is None:
+            self._head_start = element.pos_start
+        elif self._gap is None and element.pos_start != self._tail_end:
+            self._gap = (self._tail_end, element.pos_start)
+        self._tail_end = element.pos_end
+
+    def end(self, passage: Any) -> list[ReviewIssueModel]:
+        if self._head_start != 0:
+            return [self.issue(passage, f"提取元素恐有遗漏 - 首元素开头并非文章开头: {self._head_start}", 0, self._head_start)]
+        if self._tail_end != passage.length:
+            return [self.issue(passage, f"提取元素恐有遗漏 - 末元素结尾未达文章结尾: {self._tail_end}", self._tail_end, passage.length)]
+        if self._gap is not None:
+            return [self.issue(passage, f"提取元素恐有遗漏 - 前后元素有间隙: {self._gap[0]} ~ {self._gap[1]}", *self._gap)]
+        return []
+
+
+class ReversibleCheck(ElementCheck):
+    """
+    可逆，即元素可以拼回去。
+
+    不拼接整段文本，而是逐个元素与原文中当前位置的内容比较：元素恰好始于当前位置时内容必然相同，无需比较；
+    否则 (有间隙或重叠) 比较元素内容与原文当前位置的内容。
+    """
+    name = "reversible"
+
+    def begin(self, passage: Any) -> None:
+        self._cursor: int = 0
+        self._mismatch: tuple[int, int] | None = None    # 首个对不上的元素拼接后所在的位置
+
+    def visit(self, passage: Any, element: Any) -> None:
+        if self._mismatch is not None:
+            return
+        # 与切片长度一致，越过原文结尾的部分不计
+        length = max(min(element.pos_end, len(passage.body)) - element.pos_start, 0)
+        if element.pos_start != self._cursor and not passage.body.startswith(passage.body[element.pos_start:element.pos_end], self._cursor):
+            self._mismatch = (self._cursor, self._cursor + length)
+        self._cursor += length
+
+    def end(self, passage: Any) -> list[ReviewIssueModel]:
+        if self._mismatch is not None:
+            return [self.issue(passage, f"拼接后与原文不同 - 自 {self._mismatch[0]} 起", *self._mismatch)]
+        if self._cursor != len(passage.body):
+            return [self.issue(passage, f"拼接后与原文不同 - 长度 {self._cursor} / {len(passage.body)}", self._cursor, len(passage.body))]
+        return []
+
+
+class LevelCheck(ElementCheck):
+    """正常文章首尾元素层级为0，除非首尾元素为块头尾，此时层级为1"""
+    name = "level"
+
+    def begin(self, passage: Any) -> None:
+        self._head: Any = None
+        self._tail: Any = None
+
+    def visit(self, passage: Any, element: Any) -> None:
+        if self._head is None:
+            self._head = element
+        self._tail = element
+
+    def end(self, passage: Any) -> list[ReviewIssueModel]:
+        issues: list[ReviewIssueModel] = []
+        head, tail = self._head, self._tail
+
+        _is_head_element_blockhead = head.block in {ModelField.MacroBlockHead.name, ModelField.TagBlockHead.name}
+        _is_head_element_blockhead_and_level_normal = head.level == 1 and _is_head_element_blockhead
+        _is_head_element_plaintext_and_level_normal = head.level == 0 and not _is_head_element_blockhead
+        if not _is_head_element_blockhead_and_level_normal and not _is_head_element_plaintext_and_level_normal:
+            issues.append(self.issue(passage, f"首元素层级有误 - level='{head.level}'", head.pos_start, head.pos_end))
+
+        _is_tail_element_blocktail = tail.block in {ModelField.MacroBlockTail.name, ModelField.TagBlockTail.name}
+        _is_tail_element_blocktail_and_level_normal = tail.level == 1 and _is_tail_element_blocktail
+        _is_tail_element_plaintext_and_level_normal = tail.level == 0 and not _is_tail_element_blocktail
+        if not _is_tail_element_blocktail_and_level_normal and not _is_tail_element_plaintext_and_level_normal:
+            issues.append(self.issue(passage, f"尾元素层级有误 - level='{tail.level}'", tail.pos_start, tail.pos_end))
+
+        return issues
+
+
+"""Twee3Reviewer 默认执行的检查"""
+DEFAULT_CHECKS: tuple[type[ElementCheck], ...] = (OrderCheck, ReversibleCheck, LevelCheck)
+
+
+__all__ = [
+    "SNIPPET_LENGTH",
+    "ElementCheck",
+    "OrderCheck",
+    "ReversibleCheck",
+    "LevelCheck",
+    "DEFAULT_CHECKS",
+]
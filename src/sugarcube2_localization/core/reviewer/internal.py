@@ -2,13 +2,17 @@ from loguru._logger import Logger
 from pathlib import Path
 from typing import Iterator
 
-from sugarcube2_localization.config import DIR_DOL
-from sugarcube2_localization.log import logger
+from sugarcube2_localization.config import DIR_DOL, DIR_LOG
+from sugarcube2_localization.database import get_latest_run_id
+from sugarcube2_localization.exceptions import RunNotFoundException
+from sugarcube2_localization.log import NOW, logger
+from sugarcube2_localization.core.schema.data_model import ReviewReportModel
 
 
 class Reviewer:
-    def __init__(self, game_root: Path = DIR_DOL, **kwargs):
+    def __init__(self, game_root: Path = DIR_DOL, run_id: int | None = None, **kwargs):
         self._game_root: Path = game_root       # Root path for the game needed to be localized, DoL as default
+        self._run_id: int | None = run_id       # Parse run to review, the latest one of this game if not given
         self._all_filepaths: Iterator[Path] | None = None    # Absolute paths for all the files
         self._logger = logger
 
@@ -16,10 +20,34 @@ class Reviewer:
         """Check whether the basic syntax is correct."""
         raise NotImplementedError
 
+    def save_report(self, report: ReviewReportModel, filepath: Path | None = None) -> Path:
+        """将审查报告写为 JSON，默认与本次运行的日志放在一起"""
+        filepath = filepath or DIR_LOG / f"{NOW}.{report.reviewer}.json"
+        filepath.write_text(report.model_dump_json(indent=2), encoding="utf-8")
+        self.logger.info(f"Review report saved to {filepath}")
+        return filepath
+
+    def _log_summary(self, report: ReviewReportModel) -> None:
+        """逐条问题见报告本身，日志只记汇总"""
+        counts = ", ".join(f"{check}: {count}" for check, count in report.counts.items())
+        if report.passed:
+            self.logger.success(f"{report.total} checked by {report.reviewer} reviewer, no issues found.")
+        else:
+            self.logger.warning(f"{report.total} checked by {report.reviewer} reviewer, {len(report.failed)} failed ({counts}), {len(report.issues)} issues in total.")
+
     @property
     def game_root(self) -> Path:
         return self._game_root
 
+    @property
+    def run_id(self) -> int:
+        """未指定时为该游戏最近一次有段落的解析，没有则报错，而不是审查一次空的解析后判为通过"""
+        if self._run_id is None:
+            self._run_id = get_latest_run_id(self.game_root.name)
+        if self._run_id is None:
+            raise RunNotFoundException(self.game_root.name)
+        return self._run_id
+
     @property
     def all_filepaths(self) -> Iterator[Path]:
         return self._all_filepaths
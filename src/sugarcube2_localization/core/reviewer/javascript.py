@@ -1,36 +1,34 @@
-import dukpy
-
 from pathlib import Path
 from typing import Iterator
 
-from sugarcube2_localization.config import DIR_DATA
+from sugarcube2_localization.cache import ParseCache
 from sugarcube2_localization.log import logger
 from sugarcube2_localization.exceptions import GameRootNotExistException
+from sugarcube2_localization.core.acorn import AcornService, get_acorn_service
 from sugarcube2_localization.core.reviewer.internal import Reviewer
 from sugarcube2_localization.core.utils import get_all_filepaths, traceback_detail
-from sugarcube2_localization.core.schema.data_model import AcornParserOptions, JSSyntaxErrorModel
+from sugarcube2_localization.core.schema.data_model import AcornParserOptions, ReviewIssueModel, ReviewReportModel
 
 
 class JavascriptReviewer(Reviewer):
-    def __init__(self, **kwargs):
+    def __init__(self, *, use_cache: bool = False, **kwargs):
         super().__init__(**kwargs)
 
         self._logger = logger.bind(project_name="JSR")
 
-        self._interpreter: dukpy.JSInterpreter = dukpy.JSInterpreter()
+        self._acorn: AcornService | None = None
         self._parser_options: AcornParserOptions | None = None
+        self._use_cache = use_cache
+        self._cache: ParseCache | None = None   # Shared with JavaScriptParser when options are the same
 
         self.init_environment()
 
     def init_environment(self):
-        """Install required JavaScript dependencies."""
-        dukpy.install_jspackage(
-            package_name='acorn',
-            version=None,
-            modulesdir=DIR_DATA / "node_modules",
-        )
-        self.interpreter.loader.register_path(DIR_DATA / 'node_modules' / 'acorn' / 'dist')
-        self.parser_options = AcornParserOptions()
+        """Use the acorn interpreter shared with JavaScriptParser."""
+        self.acorn = get_acorn_service()
+        # 只需判断有无语法错误，错误的行列与 locations 选项无关；与 JavaScriptParser 选项相同时可共用其解析结果
+        self.parser_options = AcornParserOptions(locations=False, ranges=False)
+        self._cache = self.acorn.open_cache(self.game_root, self.parser_options) if self._use_cache else None
 
     def get_all_filepaths(self) -> Iterator[Path]:
         """Get all javascript absolute filepaths."""
@@ -38,45 +36,61 @@ class JavascriptReviewer(Reviewer):
             raise GameRootNotExistException
         return get_all_filepaths(".js", self.game_root / "game")
 
-    def validate_basic_syntax(self):
-        """https://github.com/acornjs/acorn/tree/master/acorn/"""
-        for filepath in self.get_all_filepaths():
+    def validate_basic_syntax(self, *, max_workers: int | None = 1) -> ReviewReportModel:
+        """
+        https://github.com/acornjs/acorn/tree/master/acorn/
+
+        返回审查报告，每个有语法错误的文件一条问题，按路径排序；日志中只输出汇总。
+        `max_workers` 为解析文件的进程数 (见 `get_workers_count`)。
+        """
+        issues: list[ReviewIssueModel] = []
+        all_filepaths = sorted(self.get_all_filepaths())
+        for filepath, result in zip(all_filepaths, self.acorn.iter_parse(   # JavaScriptParser 解析过的文件不再解析
+            all_filepaths, self.parser_options, nodes=False,
+            cache=self.cache, cache_keys=[str(filepath.relative_to(self.game_root)) for filepath in all_filepaths],
+            max_workers=max_workers,
+        )):
+            if result.error is None:
+                continue
+
+            error = result.error
             with filepath.open("r", encoding="utf-8") as fp:
                 js_code = fp.read()
+            error_msg, error_pointer = traceback_detail(js_code=js_code, error=error)
+            issues.append(ReviewIssueModel(
+                check="syntax",
+                filepath=filepath.relative_to(self.game_root),
+                message=f"JavaScript 语法有误：{error.message or (error.loc.line, error.loc.column)}",
+                pos_start=error.pos,
+                pos_end=error.raisedAt,
+                line=error.loc.line,
+                column=error.loc.column,
+                snippet=f"{error_msg}\n{error_pointer}",
+            ))
+
+        if self.cache is not None:  # 只检查 game 目录下的文件，不据此清理缓存
+            self.cache.save()
+
+        report = ReviewReportModel(
+            reviewer="javascript",
+            checks=["syntax"],
+            total=len(all_filepaths),
+            issues=issues,
+        )
+        self._log_summary(report)
+        return report
 
-            # language=JavaScript
-            validation = \
-            """
-            var acorn = require('acorn');
-            var options = Object.assign({}, dukpy['options']);
-            function validate() {
-                try {
-                    return acorn.parse(dukpy['js_code'], options);
-                } catch (e) {
-                    return Object.assign({error: true}, e)
-                }
-            }
-            
-            validate();
-            """
-
-            result = self.interpreter.evaljs(
-	            code=validation,
-	            js_code=js_code,
-	            options=self.parser_options.model_dump()
-            )
-            if "error" not in result:  # Syntax error
-                self.logger.bind(filepath=filepath).debug("JavaScript 语法无错误")
-                continue
+    @property
+    def acorn(self) -> AcornService:
+        return self._acorn
 
-            error_msg, error_pointer = traceback_detail(js_code=js_code, error=JSSyntaxErrorModel(**result))
-            self.logger.bind(filepath=filepath).error(f"JavaScript 语法有误：{result['loc']['line'], result['loc']['column']}")
-            self.logger.error(error_msg)
-            self.logger.error(error_pointer)
+    @acorn.setter
+    def acorn(self, _: AcornService):
+        self._acorn = _
 
     @property
-    def interpreter(self) -> dukpy.JSInterpreter:
-        return self._interpreter
+    def cache(self) -> ParseCache | None:
+        return self._cache
 
     @property
     def parser_options(self) -> AcornParserOptions:
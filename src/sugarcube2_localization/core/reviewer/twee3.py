@@ -1,26 +1,29 @@
-from collections import defaultdict
-
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import attrgetter
 from pathlib import Path
-from sqlalchemy import distinct
-from sqlalchemy.orm import Session
-from typing import Iterator
+from sqlalchemy import ColumnElement, Connection, Row, exists, select
+from sqlalchemy.orm import aliased
+from typing import Iterable, Iterator
 
-from sugarcube2_localization.database import ENGINE
+from sugarcube2_localization.config import settings
+from sugarcube2_localization.database import ENGINE, init_database
 from sugarcube2_localization.log import logger
 from sugarcube2_localization.exceptions import GameRootNotExistException
 
+from sugarcube2_localization.core.reviewer.checks import DEFAULT_CHECKS, ElementCheck
 from sugarcube2_localization.core.reviewer.internal import Reviewer
-from sugarcube2_localization.core.utils import get_all_filepaths
-from sugarcube2_localization.core.schema.enum import ModelField
-from sugarcube2_localization.core.schema.data_model import PassageModel, ElementModel
+from sugarcube2_localization.core.utils import get_all_filepaths, get_workers_count
+from sugarcube2_localization.core.schema.data_model import ReviewIssueModel, ReviewReportModel
 from sugarcube2_localization.core.schema.sql_model import PassageModelTable, ElementModelTable
 
 
 class Twee3Reviewer(Reviewer):
-    def __init__(self, **kwargs):
+    def __init__(self, checks: Iterable[type[ElementCheck]] = DEFAULT_CHECKS, **kwargs):
         super().__init__(**kwargs)
 
         self._logger = logger.bind(project_name="T3R")
+        self._checks: list[ElementCheck] = [check() for check in checks]   # Run together in one pass over each passage
 
     def get_all_filepaths(self) -> Iterator[Path]:
         """Get all twee3 absolute filepaths."""
@@ -28,89 +31,157 @@ class Twee3Reviewer(Reviewer):
             raise GameRootNotExistException
         return get_all_filepaths(".twee", self.game_root / "game")
 
-    def validate_all_elements(self):
-        """检查提取出来的元素是否有遗漏、重复"""
-        with Session(ENGINE) as session:
-            _all_passages = session.query(PassageModelTable).all()
-            all_passages_by_passage_models: dict[str, PassageModel] = {
-                _passage.title: PassageModel.model_validate(_passage, from_attributes=True)
-                for _passage in _all_passages
-            }
-
-            _all_elements = session.query(ElementModelTable).all()
-            _all_passages_names = session.query(distinct(ElementModelTable.passage)).all()
-            all_elements_by_passage_models: dict[str, list[ElementModel]] = defaultdict(list)
-            for _element in _all_elements:
-                all_elements_by_passage_models[_element.passage].append(
-                    ElementModel.model_validate(_element, from_attributes=True)
-                )
-
-        """检查提取元素是否有遗漏"""
-        validation_order = self._validate_all_elements_order(all_passages_by_passage_models, all_elements_by_passage_models)
-
-        """检查元素拼接后是否等于原文章"""
-        validation_reversible = self._validate_all_elements_reversible(all_passages_by_passage_models, all_elements_by_passage_models)
-
-        """检查文章的元素层级是否正常"""
-        validation_level = self._validate_all_elements_level_in_passage(all_elements_by_passage_models)
-
-    def _validate_all_elements_order(self, all_passages_by_passage_models: dict[str, PassageModel], all_elements_by_passage_models: dict[str, list[ElementModel]]) -> dict[str, bool]:
-        """顺序，有无遗漏"""
-        result = {}
-        for passage, elements in all_elements_by_passage_models.items():
-            if elements[0].pos_start != 0 or elements[-1].pos_end != all_passages_by_passage_models[passage].length:
-                result[passage] = False
-                self.logger.warning(f"'{passage}'提取元素恐有遗漏 - {f'首元素开头并非文章开头: {elements[0].pos_start}' if elements[0].pos_start != 0 else f'末元素结尾未达文章结尾: {elements[-1].pos_end}'}")
+    def validate_all_elements(self, *, passages: Iterable[str] | None = None, base_run_id: int | None = None, max_workers: int | None = 1) -> ReviewReportModel:
+        """
+        检查提取出来的元素是否有遗漏、重复等，各项检查 (见 checks) 在每个段落上只遍历一遍元素。
+        返回审查报告，各问题带有位置与原文片段；日志中只输出汇总。
+
+        - `passages` 给出段落标题时只检查这些段落；
+        - `base_run_id` 给出时只检查相比该次解析新增或主体有改动的段落，二者可同时使用；
+        - `max_workers` 为检查用的进程数 (见 `get_workers_count`)，并行时按段落 id 分段检查，结果按段落 id 顺序合并。
+        """
+        passages = tuple(passages) if passages is not None else None
+        init_database()
+        with ENGINE.connect() as connection:
+            passages_lengths = connection.execute(
+                select(PassageModelTable.id, PassageModelTable.length)
+                .where(*self._get_passages_filter(passages, base_run_id))
+                .order_by(PassageModelTable.id)
+            ).all()
+        self.logger.debug(f"{len(passages_lengths)} passages to validate.")
+
+        max_workers = get_workers_count(max_workers)
+        id_ranges = self._split_id_ranges(passages_lengths, max_workers * 4)
+        if max_workers == 1 or len(id_ranges) <= 1:
+            issues = self._validate_passages(passages, base_run_id)
+        else:
+            checks = [type(check) for check in self.checks]
+            issues = []
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+                futures = [
+                    executor.submit(_validate_passages_chunk, self.game_root, self.run_id, checks, passages, base_run_id, id_range)
+                    for id_range in id_ranges
+                ]
+                for future in futures:  # 按段落 id 顺序合并
+                    issues.extend(future.result())
+            self.logger.debug(f"{len(passages_lengths)} passages validated in {len(id_ranges)} chunks by {max_workers} workers.")
+
+        report = ReviewReportModel(
+            reviewer="twee3",
+            run_id=self.run_id,
+            checks=[check.name for check in self.checks],
+            total=len(passages_lengths),
+            issues=issues,
+        )
+        self._log_summary(report)
+        return report
+
+    def _validate_passages(self, passages: tuple[str, ...] | None = None, base_run_id: int | None = None, id_range: tuple[int, int] | None = None) -> list[ReviewIssueModel]:
+        """在当前进程中串行检查符合条件的段落，按段落 id 顺序返回发现的问题"""
+        checks = self.checks
+        issues: list[ReviewIssueModel] = []
+        init_database()
+        with ENGINE.connect() as connection:
+            for passage, elements in self._iter_passages_elements(connection, passages, base_run_id, id_range):
+                for check in checks:
+                    check.begin(passage)
+                for element in elements:
+                    for check in checks:
+                        check.visit(passage, element)
+                for check in checks:
+                    issues.extend(check.end(passage))
+        return issues
+
+    def _get_passages_filter(self, passages: tuple[str, ...] | None = None, base_run_id: int | None = None) -> list[ColumnElement[bool]]:
+        """
+        本次解析中待检查段落的条件。与 `base_run_id` 比较时按标题对应 (走 run_id, title 索引)，
+        该次解析中没有同名且主体相同的段落即视为有改动。
+        """
+        clauses: list[ColumnElement[bool]] = [PassageModelTable.run_id == self.run_id]
+        if passages is not None:
+            clauses.append(PassageModelTable.title.in_(passages))
+        if base_run_id is not None:
+            base = aliased(PassageModelTable)
+            clauses.append(~exists().where(
+                base.run_id == base_run_id,
+                base.title == PassageModelTable.title,
+                base.body == PassageModelTable.body,
+            ))
+        return clauses
+
+    @staticmethod
+    def _split_id_ranges(passages_lengths: list[Row], chunks_count: int) -> list[tuple[int, int]]:
+        """按段落长度将按 id 排序的段落切成总长度大致相同的若干连续区间 (首尾 id)，每段在数据库中都是顺序读取"""
+        if not passages_lengths:
+            return []
+        chunks_count = max(1, min(chunks_count, len(passages_lengths)))
+        chunk_length = sum(max(_.length, 1) for _ in passages_lengths) / chunks_count
+        id_ranges: list[tuple[int, int]] = []
+        start_id, load = passages_lengths[0].id, 0
+        for passage, next_passage in zip(passages_lengths, passages_lengths[1:]):
+            load += max(passage.length, 1)
+            if load >= chunk_length:
+                id_ranges.append((start_id, passage.id))
+                start_id, load = next_passage.id, 0
+        id_ranges.append((start_id, passages_lengths[-1].id))
+        return id_ranges
+
+    def _iter_passages_elements(self, connection: Connection, passages: tuple[str, ...] | None = None, base_run_id: int | None = None, id_range: tuple[int, int] | None = None) -> Iterator[tuple[Row, Iterator[Row]]]:
+        """
+        逐个段落产出 (段落, 按位置排序的元素)，只取校验用到的列，不创建 ORM 对象。筛选条件同 `validate_all_elements`。
+        段落、元素各用一条按段落 id 排序的查询分批读取，二者归并，同一时刻只有当前段落的主体在内存中；元素须在取下一个段落前用完。
+        没有元素的段落跳过，找不到所属段落的元素给出警告后跳过。
+        元素的 body 不在 SQL 中截取 (否则每行都要读一遍段落主体)，需要时由段落主体按位置切片。
+        """
+        clauses = self._get_passages_filter(passages, base_run_id)
+        elements_clauses = [ElementModelTable.run_id == self.run_id]
+        if passages is not None or base_run_id is not None:    # 只检查少数段落时按段落 id 走索引，否则顺序扫描
+            elements_clauses.append(ElementModelTable.passage_id.in_(select(PassageModelTable.id).where(*clauses)))
+        if id_range is not None:
+            clauses.append(PassageModelTable.id.between(*id_range))
+            elements_clauses.append(ElementModelTable.passage_id.between(*id_range))
+
+        # 段落逐行取出 (主体可能很大)，元素按批取出
+        all_passages = iter(connection.execution_options(yield_per=1).execute(
+            select(PassageModelTable.id, PassageModelTable.filepath.label("filepath"), PassageModelTable.title, PassageModelTable.body, PassageModelTable.length)
+            .where(*clauses)
+            .order_by(PassageModelTable.id)
+        ))
+        elements = connection.execution_options(yield_per=settings.database.batch_size).execute(
+            select(ElementModelTable.passage_id, ElementModelTable.pos_start, ElementModelTable.pos_end, ElementModelTable.level, ElementModelTable.block)
+            .where(*elements_clauses)
+            .order_by(ElementModelTable.passage_id, ElementModelTable.pos_start)
+        )
+        passage = next(all_passages, None)
+        for passage_id, passage_elements in groupby(elements, key=attrgetter("passage_id")):
+            # passage_id 为 NULL 的元素排在最前
+            while passage is not None and passage_id is not None and passage.id < passage_id:
+                passage = next(all_passages, None)
+            if passage is None or passage.id != passage_id:
+                self.logger.warning(f"{sum(1 for _ in passage_elements)} elements refer to missing passage {passage_id}, skipped.")
                 continue
+            yield passage, passage_elements
 
-            for idx, element in enumerate(elements):
-                if idx == len(elements) - 1:
-                    continue
-
-                if element.pos_end != elements[idx+1].pos_start:
-                    result[passage] = False
-                    self.logger.warning(f"'{passage}'提取元素恐有遗漏 - 前后元素有间隙: {element.pos_end} ~ {elements[idx+1].pos_start}")
-                    break
-
-            else:
-                result[passage] = True
-                self.logger.debug(f"'{passage}'提取元素无遗漏")
+    """ Getters & Setters """
 
-        return result
-
-    def _validate_all_elements_reversible(self, all_passages_by_passage_models: dict[str, PassageModel], all_elements_by_passage_models: dict[str, list[ElementModel]]) -> dict[str, bool]:
-        """可逆，即元素可以拼回去"""
-        result = {}
-        for passage, elements in all_elements_by_passage_models.items():
-            merged = "".join(element.body for element in elements)
-
-            if merged != all_passages_by_passage_models[passage].body:
-                self.logger.warning(f"'{passage}'拼接后与原文不同")
-                result[passage] = False
-                continue
+    @property
+    def checks(self) -> list[ElementCheck]:
+        return self._checks
 
-            self.logger.debug(f"'{passage}'可以复原")
-            result[passage] = True
+    @checks.setter
+    def checks(self, checks: list[ElementCheck]) -> None:
+        self._checks = checks
 
-        return result
 
-    def _validate_all_elements_level_in_passage(self, all_elements_by_passage_models: dict[str, list[ElementModel]]) -> dict[str, bool]:
-        """正常文章首尾元素层级为0，除非首尾元素为块头尾，此时层级为1"""
-        result = {}
-        for passage, elements in all_elements_by_passage_models.items():
-            _is_head_element_blockhead = elements[0].block in {ModelField.MacroBlockHead.name, ModelField.TagBlockHead.name}
-            _is_head_element_blockhead_and_level_normal = elements[0].level == 1 and _is_head_element_blockhead
-            _is_head_element_plaintext_and_level_normal = elements[0].level == 0 and not _is_head_element_blockhead
-            if not _is_head_element_blockhead_and_level_normal and not _is_head_element_plaintext_and_level_normal:
-                self.logger.warning(f"'{passage}'首元素层级有误 - level='{elements[0].level}', body='{elements[0].body}'")
+def _init_worker() -> None:
+    """子进程不能沿用父进程连接池中的连接 (fork 时会一并复制)，丢弃后按需重新连接"""
+    ENGINE.dispose(close=False)
 
-            _is_tail_element_blocktail = elements[-1].block in {ModelField.MacroBlockTail.name, ModelField.TagBlockTail.name}
-            _is_tail_element_blocktail_and_level_normal = elements[-1].level == 1 and _is_tail_element_blocktail
-            _is_tail_element_plaintext_and_level_normal = elements[-1].level == 0 and not _is_tail_element_blocktail
-            if not _is_tail_element_blocktail_and_level_normal and not _is_tail_element_plaintext_and_level_normal:
-                self.logger.warning(f"'{passage}'尾元素层级有误 - level='{elements[-1].level}', body='{elements[-1].body}'")
 
-        return result
+def _validate_passages_chunk(game_root: Path, run_id: int, checks: list[type[ElementCheck]], passages: tuple[str, ...] | None, base_run_id: int | None, id_range: tuple[int, int]) -> list[ReviewIssueModel]:
+    """Run in worker process, validate passages whose ids are within id_range."""
+    reviewer = Twee3Reviewer(game_root=game_root, run_id=run_id, checks=checks)
+    return reviewer._validate_passages(passages, base_run_id, id_range)
 
 
 __all__ = [
@@ -1,3 +1,4 @@
 from .enum import *
 from .data_model import *
-from .sql_model import *
\ No newline at end of file
+from .sql_model import *
+from .store import *
\ No newline at end of file
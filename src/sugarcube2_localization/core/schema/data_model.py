@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 
 
 class _BaseModelExtraAllowed(BaseModel, extra="allow"): ...
@@ -68,7 +68,10 @@ class PassageModel(_BaseModelExtraAllowed):
 
 
 class ElementModel(_BaseModelExtraAllowed):
-	"""Basic element constitutes each passage."""
+	"""
+	Basic element constitutes each passage.
+	只记录在段落中的位置，body = passage.body[pos_start:pos_end]
+	"""
 	filepath: Path = Field(...)
 	passage: str = Field(...)
 	widget: str | None = Field(default=None)
@@ -77,7 +80,7 @@ class ElementModel(_BaseModelExtraAllowed):
 	block_semantic_key: str | None = Field(default=None, description="仅当为块首尾时，存放其语义化键名")
 	block_semantic_key_hash: str | None = Field(default=None, description="语义化键名散列处理，剪短储存长度")
 	type: str | None = Field(default=None)
-	body: str | None = Field(default=None)
+	source: str | None = Field(default=None, exclude=True, repr=False, description="所属段落的主体，仅引用不复制，body 由其按位置切片得到")
 	arguments: str | None = Field(default=None, description="仅当为MACRO时，存放其参数")
 	# body_desugared: str = Field(default="MISSING_DESUGARED")
 	pos_start: int = Field(default=-1)
@@ -86,6 +89,22 @@ class ElementModel(_BaseModelExtraAllowed):
 	level: int = Field(default=-1)
 	# data: ElementCommentModel | ElementMacroModel | None = Field(default=None)
 
+	@computed_field
+	@property
+	def body(self) -> str | None:
+		"""按需从段落主体中切出，不单独保存"""
+		return self.source[self.pos_start:self.pos_end] if self.source is not None else None
+
+
+class ElementSearchResultModel(_BaseModelExtraAllowed):
+	"""全文搜索命中的一个纯文本元素"""
+	filepath: Path = Field(...)
+	passage: str = Field(...)
+	block_semantic_key: str | None = Field(default=None, description="所在块的语义化键名，直接位于段落之下则为 None")
+	pos_start: int = Field(default=-1)
+	pos_end: int = Field(default=-1)
+	snippet: str | None = Field(default=None, description="命中处附近的原文，匹配部分以 [] 标出")
+
 
 """ JavaScript Parser"""
 class NodeModel(_BaseModelExtraAllowed):
@@ -97,6 +116,13 @@ class NodeModel(_BaseModelExtraAllowed):
 	length: int = Field(default=-1)
 
 
+class JSParseResultModel(_BaseModelExtraAllowed):
+	"""acorn 解析一个文件的结果，JavaScriptParser 与 JavascriptReviewer 共用"""
+	filepath: Path = Field(...)
+	nodes: list[NodeModel] | None = Field(default=None, description="顶层节点，有语法错误时为空，只检查语法时为 None")
+	error: "JSSyntaxErrorModel | None" = Field(default=None)
+
+
 """ Reviewer """
 class AcornParserOptions(_BaseModelExtraAllowed):
 	"""https://github.com/acornjs/acorn/tree/master/acorn/#interface"""
@@ -128,6 +154,48 @@ class AcornParserOptions(_BaseModelExtraAllowed):
 	preserveParens: bool | None = Field(default=False)
 
 
+class ReviewIssueModel(_BaseModelExtraAllowed):
+	"""审查发现的一处问题"""
+	check: str = Field(..., description="发现问题的检查，如 order / reversible / level / syntax")
+	filepath: Path | None = Field(default=None)
+	passage: str | None = Field(default=None, description="所在段落标题，JavaScript 文件为 None")
+	message: str = Field(...)
+	pos_start: int = Field(default=-1, description="问题在段落主体 / 文件中的起止位置")
+	pos_end: int = Field(default=-1)
+	line: int | None = Field(default=None)
+	column: int | None = Field(default=None)
+	snippet: str | None = Field(default=None, description="问题处的原文，过长时截断")
+
+
+class ReviewReportModel(_BaseModelExtraAllowed):
+	"""一次审查的结果，可用 `model_dump_json()` 序列化后交给 CI 等解析"""
+	reviewer: str = Field(...)
+	run_id: int | None = Field(default=None, description="审查的解析结果，JavaScript 审查直接读文件，为 None")
+	checks: list[str] = Field(default_factory=list)
+	total: int = Field(default=0, description="审查过的段落 / 文件数")
+	issues: list[ReviewIssueModel] = Field(default_factory=list)
+
+	@computed_field
+	@property
+	def failed(self) -> list[str]:
+		"""未通过的段落标题 (JavaScript 为文件路径)，按出现顺序去重"""
+		return list(dict.fromkeys(issue.passage or str(issue.filepath) for issue in self.issues))
+
+	@computed_field
+	@property
+	def counts(self) -> dict[str, int]:
+		"""各项检查未通过的段落 / 文件数"""
+		return {
+			check: len({issue.passage or str(issue.filepath) for issue in self.issues if issue.check == check})
+			for check in self.checks
+		}
+
+	@computed_field
+	@property
+	def passed(self) -> bool:
+		return not self.issues
+
+
 class JSSyntaxErrorModel(_BaseModelExtraAllowed):
 	"""Javascript syntax errors from Acorn"""
 	class LocationModel(_BaseModelExtraAllowed):
@@ -138,6 +206,7 @@ class JSSyntaxErrorModel(_BaseModelExtraAllowed):
 	pos: int = Field(...)
 	loc: LocationModel = Field(...)
 	raisedAt: int = Field(...)
+	message: str | None = Field(default=None)
 
 """ From sugarcube-2 """
 
@@ -157,14 +226,21 @@ __all__ = [
 	"WidgetModel",
 	"PassageModel",
 	"ElementModel",
+	"ElementSearchResultModel",
 
 	"NodeModel",
+	"JSParseResultModel",
 
 	"AcornParserOptions",
+	"ReviewIssueModel",
+	"ReviewReportModel",
 	"JSSyntaxErrorModel",
 ]
 
 
+JSParseResultModel.model_rebuild()
+
+
 if __name__ == '__main__':
 	options = AcornParserOptions(ecmaVersion=2022)
 	print(options.model_dump())
@@ -1,6 +1,6 @@
 import re
 
-from enum import Enum, auto
+from enum import Enum, IntEnum, auto
 
 
 class Patterns(Enum):
@@ -28,6 +28,12 @@ class Patterns(Enum):
 	""" Special """
 	MacroWidget = re.compile(r"""<<widget(?:\s*)((?:(?:/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)|(?://.*\n)|(?:`(?:\\.|[^`\\])*`)|(?:"(?:\\.|[^"\\])*")|(?:'(?:\\.|[^'\\])*')|(?:/(?:\\.|[^/\\])*/)|(?:\[(?:[<>]?[Ii][Mm][Gg])?\[[^\r\n]*?\]\]+)|[^>]|(?:>(?!>)))*)>>""")
 
+	""" Lexer """
+	# 将 Comment / Macro / Tag 合为一条正则，每个段落只需扫描一次，且不会匹配到嵌套在其他元素内部的元素
+	# 命名分组即元素类型，其后第二个分组为参数，与单独使用各正则时的 `match.groups()[1]` 一致
+	Element = re.compile(rf"""(?P<Comment>{Comment.pattern})|(?P<Macro>{Macro.pattern})|(?P<Tag>{Tag.pattern})""")
+	ElementOld = re.compile(rf"""(?P<Comment>{Comment.pattern})|(?P<MacroOld>{MacroOld.pattern})|(?P<Tag>{Tag.pattern})""")
+
 	# """ Fragment """
 	# Variable = re.compile(r"""[$_][$A-Z_a-z][$0-9A-Z_a-z]*""")
 	# Space = re.compile(r'[\s\u0020\f\n\r\t\v\u00a0\u1680\u180e\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff]')
@@ -147,7 +153,18 @@ class ModelField(Enum):
 	TagBlockTail = auto()
 
 
+class ElementType(IntEnum):
+	"""元素类型，名称与 Patterns 中对应的成员一致；数据库中只存其整数值"""
+	PlainText = 0
+	Comment = 1
+	Macro = 2
+	MacroOld = 3
+	Tag = 4
+	JavaScript = 5
+
+
 __all__ = [
 	"Patterns",
 	"ModelField",
+	"ElementType",
 ]
\ No newline at end of file
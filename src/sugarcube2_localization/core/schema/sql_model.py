@@ -1,77 +1,200 @@
-from sqlalchemy import ForeignKey, JSON
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import DDL, ForeignKey, Index, SmallInteger, TypeDecorator, UniqueConstraint, event, func, select
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
+
+from sugarcube2_localization.config import settings
+from sugarcube2_localization.core.schema.enum import ElementType, ModelField
 
 
 class BaseTable(DeclarativeBase): ...
 
 
+class _EnumName(TypeDecorator):
+	"""取值种类很少的字符串列，库中只存对应枚举成员的整数值，读写时仍是成员名称"""
+	impl = SmallInteger
+	cache_ok = True
+
+	def __init__(self, enum_class: type[Enum]):
+		super().__init__()
+		self.enum_class = enum_class
+
+	def process_bind_param(self, value: str | None, dialect) -> int | None:
+		return self.enum_class[value].value if value is not None else None
+
+	def process_result_value(self, value: int | None, dialect) -> str | None:
+		return self.enum_class(value).name if value is not None else None
+
+
+class RunModelTable(BaseTable):
+	"""每次解析记一条，其余各表的行都指向所属的解析，多次解析的结果可以共存、比较"""
+	__tablename__ = 'run'
+
+	id: Mapped[int] = mapped_column(primary_key=True)
+
+	game: Mapped[str] = mapped_column(nullable=True)
+	commit: Mapped[str] = mapped_column(nullable=True)
+	timestamp: Mapped[datetime] = mapped_column(default=datetime.now)
+
+
+class FileModelTable(BaseTable):
+	"""解析过的源文件，路径相对于游戏根目录；段落、节点只引用其 id，不再逐行重复路径"""
+	__tablename__ = 'file'
+	__table_args__ = (
+		UniqueConstraint("run_id", "filepath"),
+	)
+
+	id: Mapped[int] = mapped_column(primary_key=True)
+	run_id: Mapped[int] = mapped_column(ForeignKey("run.id"), nullable=True)
+
+	filepath: Mapped[str] = mapped_column(nullable=True)
+
+
 """ Twee3 Parser """
 class PassageModelTable(BaseTable):
 	__tablename__ = 'passage'
+	__table_args__ = (
+		Index("ix_passage_run_id_title", "run_id", "title"),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
+	run_id: Mapped[int] = mapped_column(ForeignKey("run.id"), nullable=True)
+	file_id: Mapped[int] = mapped_column(ForeignKey("file.id"), index=True, nullable=True)
 
-	filepath: Mapped[str] = mapped_column(nullable=True)
 	title: Mapped[str] = mapped_column(nullable=True)
 	tag: Mapped[str] = mapped_column(nullable=True)
 	body: Mapped[str] = mapped_column(nullable=True)
 	length: Mapped[int] = mapped_column(nullable=True)
-	widgets: Mapped[list] = mapped_column(JSON, nullable=True)
+
+	filepath: Mapped[str] = column_property(
+		select(FileModelTable.filepath)
+		.where(FileModelTable.id == file_id)
+		.scalar_subquery()
+	)
+	widgets: Mapped[list["WidgetModelTable"]] = relationship(lazy="selectin", order_by="WidgetModelTable.id")
 
 
 class WidgetModelTable(BaseTable):
+	"""同元素，body 不另存，由段落主体按位置截取"""
 	__tablename__ = 'widget'
 
 	id: Mapped[int] = mapped_column(primary_key=True)
+	run_id: Mapped[int] = mapped_column(ForeignKey("run.id"), index=True, nullable=True)
+	passage_id: Mapped[int] = mapped_column(ForeignKey("passage.id"), index=True, nullable=True)
 
 	name: Mapped[str] = mapped_column(nullable=True)
 	# args: Mapped[list]
-	body: Mapped[str] = mapped_column(nullable=True)
 	pos_start: Mapped[int] = mapped_column(nullable=True)
 	pos_end: Mapped[int] = mapped_column(nullable=True)
 	length: Mapped[int] = mapped_column(nullable=True)
 
-	passage: Mapped[str] = mapped_column(nullable=True)
+	passage: Mapped[str] = column_property(
+		select(PassageModelTable.title)
+		.where(PassageModelTable.id == passage_id)
+		.scalar_subquery()
+	)
+	# pos_start ~ pos_end 含 <<widget>> 首尾，body 只是其间的 length 个字符，紧挨着 <</widget>>
+	body: Mapped[str] = column_property(
+		select(func.substr(PassageModelTable.body, pos_end - length - len("<</widget>>") + 1, length))
+		.where(PassageModelTable.id == passage_id)
+		.scalar_subquery()
+	)
 
 
 class ElementModelTable(BaseTable):
+	"""
+	不保存 body，只保存在所属段落中的位置，查询时再从段落主体中截取；
+	文件路径、段落标题由 passage_id 关联得到，类型、块首尾存为小整数。
+	"""
 	__tablename__ = 'element'
+	__table_args__ = (
+		Index("ix_element_passage_id_pos_start", "passage_id", "pos_start"),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
-
-	filepath: Mapped[str] = mapped_column(nullable=True)
-	passage: Mapped[str] = mapped_column(nullable=True)
+	run_id: Mapped[int] = mapped_column(ForeignKey("run.id"), index=True, nullable=True)
+	passage_id: Mapped[int] = mapped_column(ForeignKey("passage.id"), nullable=True)
 	widget: Mapped[str] = mapped_column(nullable=True)
-	block: Mapped[str] = mapped_column(nullable=True)
+	block: Mapped[str] = mapped_column(_EnumName(ModelField), nullable=True)
 	block_name: Mapped[str] = mapped_column(nullable=True)
 	block_semantic_key: Mapped[str] = mapped_column(nullable=True)
-	block_semantic_key_hash: Mapped[str] = mapped_column(nullable=True)
-	type: Mapped[str] = mapped_column(nullable=True)
-	body: Mapped[str] = mapped_column(nullable=True)
+	block_semantic_key_hash: Mapped[str] = mapped_column(index=True, nullable=True)
+	type: Mapped[str] = mapped_column(_EnumName(ElementType), nullable=True)
 	arguments: Mapped[str] = mapped_column(nullable=True)
 	pos_start: Mapped[int] = mapped_column(nullable=True)
 	pos_end: Mapped[int] = mapped_column(nullable=True)
-	length: Mapped[int] = mapped_column(nullable=True)
 	level: Mapped[int] = mapped_column(nullable=True)
 
+	length: Mapped[int] = column_property(pos_end - pos_start)
+	passage: Mapped[str] = column_property(
+		select(PassageModelTable.title)
+		.where(PassageModelTable.id == passage_id)
+		.scalar_subquery()
+	)
+	filepath: Mapped[str] = column_property(
+		select(FileModelTable.filepath)
+		.join(PassageModelTable, PassageModelTable.file_id == FileModelTable.id)
+		.where(PassageModelTable.id == passage_id)
+		.scalar_subquery()
+	)
+	# SQLite substr 从 1 开始计数，按字符 (而非字节) 截取，与 Python 切片一致
+	body: Mapped[str] = column_property(
+		select(func.substr(PassageModelTable.body, pos_start + 1, pos_end - pos_start))
+		.where(PassageModelTable.id == passage_id)
+		.scalar_subquery(),
+		deferred=True,
+	)
+
 
 """ JavaScript Parser"""
 class NodeModelTable(BaseTable):
 	__tablename__ = 'node'
 
 	id: Mapped[int] = mapped_column(primary_key=True)
+	run_id: Mapped[int] = mapped_column(ForeignKey("run.id"), index=True, nullable=True)
+	file_id: Mapped[int] = mapped_column(ForeignKey("file.id"), index=True, nullable=True)
 
-	filepath: Mapped[str] = mapped_column(nullable=True)
 	type: Mapped[str] = mapped_column(nullable=True)
 	body: Mapped[str] = mapped_column(nullable=True)
 	pos_start: Mapped[int] = mapped_column(nullable=True)
 	pos_end: Mapped[int] = mapped_column(nullable=True)
 	length: Mapped[int] = mapped_column(nullable=True)
 
+	filepath: Mapped[str] = column_property(
+		select(FileModelTable.filepath)
+		.where(FileModelTable.id == file_id)
+		.scalar_subquery()
+	)
+
+
+""" Full-text search """
+"""
+纯文本元素的 FTS5 索引 (仅当 settings.database.fts 开启时创建)。
+元素不保存 body，因此以视图 element_text 作为外部内容表，索引本身不再存一份原文；
+写入元素后由 search.index_elements 按解析同步。
+"""
+_ELEMENT_TEXT_VIEW = DDL(f"""
+CREATE VIEW IF NOT EXISTS element_text AS
+SELECT element.id AS id, element.run_id AS run_id, substr(passage.body, element.pos_start + 1, element.pos_end - element.pos_start) AS body
+FROM element JOIN passage ON passage.id = element.passage_id
+WHERE element.type = {ElementType.PlainText.value}
+""")
+_ELEMENT_FTS_TABLE = DDL(f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS element_fts USING fts5(body, content='element_text', content_rowid='id', tokenize='{settings.database.fts_tokenizer}')
+""")
+
+for _ddl in (_ELEMENT_TEXT_VIEW, _ELEMENT_FTS_TABLE):
+	event.listen(BaseTable.metadata, "after_create", _ddl.execute_if(callable_=lambda *args, **kwargs: settings.database.fts))
+for _ddl in (DDL("DROP TABLE IF EXISTS element_fts"), DDL("DROP VIEW IF EXISTS element_text")):
+	event.listen(BaseTable.metadata, "before_drop", _ddl)
+
 
 __all__ = [
 	"BaseTable",
+	"RunModelTable",
+	"FileModelTable",
 	"PassageModelTable",
 	"WidgetModelTable",
 	"ElementModelTable",
@@ -0,0 +1,252 @@
+"""
+Compact in-memory storage of elements.
+
+Elements of one passage are kept column by column: positions and levels in `array`,
+category-like strings (type, widget, block, block name) interned, and the body is never copied.
+`ElementView` exposes the same fields as `ElementModel` on top of one row,
+convert to `ElementModel` only when leaving the parser.
+"""
+import sys
+
+from array import array
+from pathlib import Path
+from typing import Any, Iterator
+
+from sugarcube2_localization.core.schema.data_model import ElementModel
+
+
+def _intern(value: str | None) -> str | None:
+	"""取值种类很少的字符串列，驻留后各行共用同一个对象"""
+	return sys.intern(value) if value is not None else None
+
+
+class ElementView:
+	"""
+	Lightweight view of one row in `ElementStore`, fields are the same as `ElementModel`.
+
+	每个字段直接按下标读写所属 ElementStore 的同名列，不经过按名称的查找；
+	即便如此每次读取仍是一次 Python 层的调用，逐行读取比 `ElementModel` 的普通属性慢数倍，换来的是内存小一个数量级。
+	"""
+	__slots__ = ("_store", "_idx")
+
+	def __init__(self, store: "ElementStore", idx: int):
+		self._store = store
+		self._idx = idx
+
+	@property
+	def widget(self) -> str | None:
+		return self._store.widget[self._idx]
+
+	@widget.setter
+	def widget(self, value: str | None) -> None:
+		self._store.widget[self._idx] = _intern(value)
+
+	@property
+	def block(self) -> str | None:
+		return self._store.block[self._idx]
+
+	@block.setter
+	def block(self, value: str | None) -> None:
+		self._store.block[self._idx] = _intern(value)
+
+	@property
+	def block_name(self) -> str | None:
+		return self._store.block_name[self._idx]
+
+	@block_name.setter
+	def block_name(self, value: str | None) -> None:
+		self._store.block_name[self._idx] = _intern(value)
+
+	@property
+	def block_semantic_key(self) -> str | None:
+		return self._store.block_semantic_key[self._idx]
+
+	@block_semantic_key.setter
+	def block_semantic_key(self, value: str | None) -> None:
+		self._store.block_semantic_key[self._idx] = value
+
+	@property
+	def block_semantic_key_hash(self) -> str | None:
+		return self._store.block_semantic_key_hash[self._idx]
+
+	@block_semantic_key_hash.setter
+	def block_semantic_key_hash(self, value: str | None) -> None:
+		self._store.block_semantic_key_hash[self._idx] = value
+
+	@property
+	def type(self) -> str:
+		return self._store.type[self._idx]
+
+	@type.setter
+	def type(self, value: str) -> None:
+		self._store.type[self._idx] = _intern(value)
+
+	@property
+	def arguments(self) -> str | None:
+		return self._store.arguments[self._idx]
+
+	@arguments.setter
+	def arguments(self, value: str | None) -> None:
+		self._store.arguments[self._idx] = value
+
+	@property
+	def pos_start(self) -> int:
+		return self._store.pos_start[self._idx]
+
+	@pos_start.setter
+	def pos_start(self, value: int) -> None:
+		self._store.pos_start[self._idx] = value
+
+	@property
+	def pos_end(self) -> int:
+		return self._store.pos_end[self._idx]
+
+	@pos_end.setter
+	def pos_end(self, value: int) -> None:
+		self._store.pos_end[self._idx] = value
+
+	@property
+	def level(self) -> int:
+		return self._store.level[self._idx]
+
+	@level.setter
+	def level(self, value: int) -> None:
+		self._store.level[self._idx] = value
+
+	@property
+	def filepath(self) -> Path:
+		return self._store.filepath
+
+	@property
+	def passage(self) -> str:
+		return self._store.passage
+
+	@property
+	def source(self) -> str:
+		return self._store.source
+
+	@property
+	def body(self) -> str:
+		return self._store.source[self.pos_start:self.pos_end]
+
+	@property
+	def length(self) -> int:
+		store, idx = self._store, self._idx
+		return store.pos_end[idx] - store.pos_start[idx]
+
+	def to_model(self) -> ElementModel:
+		return ElementModel(
+			filepath=self.filepath,
+			passage=self.passage,
+			widget=self.widget,
+			block=self.block,
+			block_name=self.block_name,
+			block_semantic_key=self.block_semantic_key,
+			block_semantic_key_hash=self.block_semantic_key_hash,
+			type=self.type,
+			source=self.source,
+			arguments=self.arguments,
+			pos_start=self.pos_start,
+			pos_end=self.pos_end,
+			length=self.length,
+			level=self.level,
+		)
+
+	def __repr__(self) -> str:
+		return f"ElementView(passage={self.passage!r}, type={self.type!r}, pos_start={self.pos_start}, pos_end={self.pos_end}, level={self.level})"
+
+
+class ElementStore:
+	"""
+	All elements of one passage, in order.
+
+	Parameters
+	----------
+	filepath : Path
+		Relative filepath of the passage.
+	passage : str
+		Title of the passage.
+	source : str
+		Body of the passage, referenced by every element rather than copied.
+	"""
+	__slots__ = (
+		"filepath", "passage", "source", "_columns",
+		"pos_start", "pos_end", "level",
+		"widget", "block", "block_name", "block_semantic_key", "block_semantic_key_hash", "type", "arguments",
+	)
+
+	INT_COLUMNS = ("pos_start", "pos_end", "level")
+	STR_COLUMNS = ("widget", "block", "block_name", "block_semantic_key", "block_semantic_key_hash", "type", "arguments")
+
+	def __init__(self, filepath: Path, passage: str, source: str):
+		self.filepath = filepath
+		self.passage = passage
+		self.source = source
+		for name in self.INT_COLUMNS:
+			setattr(self, name, array("i"))
+		for name in self.STR_COLUMNS:
+			setattr(self, name, [])
+		# 与各列 slot 是同一批对象，按名称批量遍历时使用
+		self._columns: dict[str, array | list] = {name: getattr(self, name) for name in (*self.INT_COLUMNS, *self.STR_COLUMNS)}
+
+	def append(
+		self, type_: str, pos_start: int, pos_end: int, *,
+		widget: str | None = None, arguments: str | None = None,
+		block: str | None = None, block_name: str | None = None,
+		block_semantic_key: str | None = None, block_semantic_key_hash: str | None = None,
+		level: int = -1,
+	) -> None:
+		self.type.append(sys.intern(type_))
+		self.pos_start.append(pos_start)
+		self.pos_end.append(pos_end)
+		self.level.append(level)
+		self.widget.append(_intern(widget))
+		self.arguments.append(arguments)
+		self.block.append(_intern(block))
+		self.block_name.append(_intern(block_name))
+		self.block_semantic_key.append(block_semantic_key)
+		self.block_semantic_key_hash.append(block_semantic_key_hash)
+
+	def append_from(self, element: ElementView) -> None:
+		"""Copy a row of another store, which must share the same passage."""
+		for name, column in self._columns.items():
+			column.append(element._store._columns[name][element._idx])
+
+	def column(self, name: str) -> array | list:
+		"""整列取出，用于按位置排序等批量操作；不要直接修改长度"""
+		return self._columns[name]
+
+	def to_models(self) -> list[ElementModel]:
+		return [element.to_model() for element in self]
+
+	def to_rows(self, **constants: Any) -> Iterator[dict[str, Any]]:
+		"""
+		逐行输出各列 (不含 body)，键与 ElementModelTable 的列一致，用于批量写入数据库。
+		`constants` 为每行都相同的列，如 run_id、passage_id。
+		"""
+		names = tuple(self._columns)
+		for values in zip(*self._columns.values()):
+			yield {**constants, **dict(zip(names, values))}
+
+	def __len__(self) -> int:
+		return len(self.pos_start)
+
+	def __getitem__(self, idx: int) -> ElementView:
+		length = len(self)
+		if idx < 0:
+			idx += length
+		if not 0 <= idx < length:
+			raise IndexError("element index out of range")
+		return ElementView(self, idx)
+
+	def __iter__(self) -> Iterator[ElementView]:
+		return (ElementView(self, idx) for idx in range(len(self)))
+
+	def __repr__(self) -> str:
+		return f"ElementStore(passage={self.passage!r}, elements={len(self)})"
+
+
+__all__ = [
+	"ElementStore",
+	"ElementView",
+]
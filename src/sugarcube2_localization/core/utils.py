@@ -1,8 +1,14 @@
+import os
+
+from bisect import bisect_right
+from itertools import chain
 from pathlib import Path
-from typing import Iterator
+from typing import Iterable, Iterator, TypeVar
 
 from sugarcube2_localization.core.schema.data_model import JSSyntaxErrorModel
 
+T = TypeVar("T")
+
 
 def get_all_filepaths(suffix: str, directory: Path) -> Iterator[Path]:
 	"""
@@ -24,6 +30,101 @@ def get_all_filepaths(suffix: str, directory: Path) -> Iterator[Path]:
 	return directory.glob(f"**/*{suffix}")
 
 
+def get_workers_count(max_workers: int | None) -> int:
+	"""
+	Number of worker processes for a `max_workers` argument.
+
+	各解析器、检查器的 `max_workers` 含义相同：1 (默认) 时在当前进程中串行处理，不创建进程池；
+	大于 1 时使用这么多个子进程，None 时使用 CPU 核数。并行时的结果及其顺序与串行一致。
+	"""
+	return max_workers or os.cpu_count() or 1
+
+
+def start_pool(items: Iterator[T]) -> Iterator[T]:
+	"""
+	Take the first item of a generator backed by a process pool right away, yield the rest lazily.
+
+	这类生成器产出第一项前已创建进程池、提交全部任务，子进程都已 fork。
+	fork 时不能有写入线程 (BatchWriter) 在运行：它可能正持有 sqlite、loguru 的锁，子进程中再无人释放。
+	因此先调用本函数，再启动写入线程，之后边取结果边写入。
+	"""
+	items = iter(items)
+	for first in items:
+		return chain((first,), items)
+	return iter(())
+
+
+class IntervalIndex:
+	"""
+	Sorted intervals `[pos_start, pos_end)` of one passage, built once and queried by binary search.
+
+	Parameters
+	----------
+	spans : Iterable[tuple[int, int]]
+		Non-overlapping intervals, e.g. widgets of a widget-passage.
+	"""
+	def __init__(self, spans: Iterable[tuple[int, int]] = ()):
+		spans = list(spans)
+		self._order: list[int] = sorted(range(len(spans)), key=lambda idx: spans[idx])
+		self._starts: list[int] = [spans[idx][0] for idx in self._order]
+		self._ends: list[int] = [spans[idx][1] for idx in self._order]
+
+	def __len__(self) -> int:
+		return len(self._order)
+
+	def find_enclosing(self, pos_start: int, pos_end: int) -> int:
+		"""
+		Find the interval which contains the given span.
+
+		Parameters
+		----------
+		pos_start : int
+			Start of the span.
+		pos_end : int
+			End of the span.
+
+		Returns
+		-------
+		int
+			Index of the enclosing interval in the original `spans`, -1 if none.
+		"""
+		idx = bisect_right(self._starts, pos_start) - 1
+		if idx < 0 or pos_end > self._ends[idx]:
+			return -1
+		return self._order[idx]
+
+	@staticmethod
+	def partition(spans: Iterable[tuple[int, int]], length: int) -> Iterator[tuple[int, int, int]]:
+		"""
+		Sweep sorted spans once, dropping spans which start inside an earlier one and yielding the gaps between them.
+
+		Parameters
+		----------
+		spans : Iterable[tuple[int, int]]
+			Spans sorted by `pos_start`.
+		length : int
+			Total length to cover, gaps are yielded up to here.
+
+		Returns
+		-------
+		Iterator[tuple[int, int, int]]
+			`(pos_start, pos_end, idx)` covering `[0, length)` in order, `idx` is the index of the kept span in `spans`,
+			or -1 for a gap.
+		"""
+		cursor = 0  # 上一个保留区间的结尾，空隙从这里开始
+		reach = 0   # 目前所有区间(含被丢弃的)到达的最远位置
+		for idx, (pos_start, pos_end) in enumerate(spans):
+			if pos_start < reach:
+				reach = max(reach, pos_end)
+				continue
+			if pos_start > cursor:
+				yield cursor, pos_start, -1
+			yield pos_start, pos_end, idx
+			cursor = reach = pos_end
+		if cursor < length:
+			yield cursor, length, -1
+
+
 def traceback_detail(js_code: str, error: JSSyntaxErrorModel) -> tuple[str, str]:
     """
     Javascript traceback details.
@@ -239,5 +340,8 @@ def traceback_detail(js_code: str, error: JSSyntaxErrorModel) -> tuple[str, str]
 
 __all__ = [
 	"get_all_filepaths",
+	"get_workers_count",
+	"start_pool",
 	"traceback_detail",
+	"IntervalIndex",
 ]
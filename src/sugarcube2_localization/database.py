@@ -1,17 +1,273 @@
-from sqlalchemy import create_engine
+import subprocess
 
-from sugarcube2_localization.config import DIR_DATABASE
+from contextlib import contextmanager, suppress
+from itertools import islice
+from pathlib import Path
+from queue import Queue
+from sqlalchemy import Connection, create_engine, event, exists, func, insert, inspect, select
+from sqlalchemy.orm import Session
+from threading import Thread
+from typing import Any, Iterable, Iterator
+
+from sugarcube2_localization.config import DIR_DATABASE, settings
 from sugarcube2_localization.log import logger
-from sugarcube2_localization.core.schema.sql_model import BaseTable
+from sugarcube2_localization.core.schema.sql_model import BaseTable, PassageModelTable, RunModelTable
 
 DIR_DATABASE.mkdir(parents=True, exist_ok=True)
 ENGINE = create_engine(f'sqlite+pysqlite:///{DIR_DATABASE}/db.db')
 logger.info(f"Database {DIR_DATABASE}/db.db initialized")
 
-BaseTable.metadata.drop_all(ENGINE)
-BaseTable.metadata.create_all(ENGINE)
+"""表结构版本，记在 PRAGMA user_version 中；修改 sql_model 中的表时加一，旧数据库会被重建"""
+SCHEMA_VERSION = 2
+
+"""本进程中是否已检查过表结构"""
+_initialized: bool = False
+
+
+@event.listens_for(ENGINE, "connect")
+def _set_journal_mode(dbapi_connection, connection_record) -> None:
+    """journal_mode 写在数据库文件里，每个连接设置一次即可"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.database.journal_mode}")
+    cursor.close()
+
+
+@event.listens_for(ENGINE, "checkout")
+def _set_safe_profile(dbapi_connection, connection_record, connection_proxy) -> None:
+    """取出的连接一律使用安全配置；只有 `ingest_mode` 中写入的连接会切换，且归还前切回，这里只是兜底"""
+    if connection_record.info.get("profile") != "safe":
+        _set_profile(dbapi_connection, connection_record.info, "safe")
+
+
+def _set_profile(dbapi_connection, info: dict, profile: str) -> None:
+    """synchronous 不能在事务中修改，须在开始事务之前或提交之后设置"""
+    cursor = dbapi_connection.cursor()
+    for name, value in _get_pragmas(profile).items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+    info["profile"] = profile
+
+
+def _get_pragmas(profile: str) -> dict[str, str | int]:
+    database = settings.database
+    if profile == "ingest":
+        return {
+            "synchronous": database.ingest_synchronous,
+            "cache_size": database.ingest_cache_size,
+            "temp_store": database.ingest_temp_store,
+        }
+    return {
+        "synchronous": database.synchronous,
+        "cache_size": database.cache_size,
+        "temp_store": database.temp_store,
+    }
+
+
+@contextmanager
+def ingest_mode() -> Iterator[Connection]:
+    """
+    取出一个专用于批量写入的连接，在一个事务中写入，退出时提交 (出错则回滚)。
+
+    只有这个连接使用批量写入配置 (见 DatabaseSettings.ingest_*)，同时取出的其他连接 (如其他线程中的读取) 仍为安全配置；
+    归还前切回安全配置，并将 WAL 合并回数据库文件。
+    """
+    with ENGINE.connect() as connection:
+        pool_connection = connection.connection
+        if settings.database.ingest:
+            _set_profile(pool_connection.dbapi_connection, pool_connection.info, "ingest")
+        try:
+            with connection.begin():
+                yield connection
+        finally:
+            if pool_connection.info.get("profile") != "safe":
+                _set_profile(pool_connection.dbapi_connection, pool_connection.info, "safe")
+            cursor = pool_connection.dbapi_connection.cursor()
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            cursor.close()
+
+
+def init_database(*, reset: bool = False) -> None:
+    """
+    Create missing tables, called lazily before the first read / write rather than on import.
+
+    已有的解析结果会保留；仅当数据库的表结构版本与 SCHEMA_VERSION 不同，或 `reset` 为 True 时才清空重建。
+    """
+    global _initialized
+    if _initialized and not reset:
+        return
+
+    with ENGINE.begin() as connection:
+        schema_version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        if reset or schema_version != SCHEMA_VERSION:
+            if not reset and inspect(connection).get_table_names():
+                logger.warning(f"Database schema version {schema_version} is outdated (current: {SCHEMA_VERSION}), rebuilding.")
+            BaseTable.metadata.drop_all(connection)
+        BaseTable.metadata.create_all(connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    _initialized = True
+
+
+def create_run(game_root: Path) -> int:
+    """Record a new parse of the game, return its id which every row written afterward refers to."""
+    run_id, = insert_rows(RunModelTable, [dict(
+        game=game_root.name,
+        commit=_get_commit(game_root),
+    )], returning_ids=True)
+    logger.info(f"Run {run_id} created for {game_root.name}")
+    return run_id
+
+
+def get_latest_run_id(game: str) -> int | None:
+    """
+    Id of the latest parse of the game (named after its root directory) that has passages, None if there is none.
+
+    只解析了 JS (单独运行 JavaScriptParser) 等没有段落的解析不算，否则审查时会对一次空的解析得出“通过”。
+    """
+    init_database()
+    with ENGINE.connect() as connection:
+        return connection.execute(
+            select(func.max(RunModelTable.id))
+            .where(RunModelTable.game == game, exists().where(PassageModelTable.run_id == RunModelTable.id))
+        ).scalar()
+
+
+def _get_commit(game_root: Path) -> str | None:
+    """游戏仓库当前的 commit，不是 git 仓库则为 None"""
+    with suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=game_root, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    return None
+
+
+def insert_rows(table: type[BaseTable], rows: Iterable[dict[str, Any]], *, returning_ids: bool = False, batch_size: int | None = None, bulk: bool | None = None) -> list[int]:
+    """
+    Insert rows into the table within one transaction.
+
+    默认按 `batch_size` 行一批，用 Core `insert()` executemany 写入，不创建 ORM 对象；
+    `bulk` 为 False 时退回逐个创建 ORM 对象的写法。二者均可接受生成器，
+    `returning_ids` 为 True 时按 rows 的顺序返回各行主键。
+    """
+    init_database()
+    batch_size = batch_size or settings.database.batch_size
+    bulk = settings.database.bulk_insert if bulk is None else bulk
+    if not bulk:
+        return _insert_rows_orm(table, rows, returning_ids=returning_ids)
+
+    statement = insert(table)
+    if returning_ids:
+        statement = statement.returning(table.id, sort_by_parameter_order=True)
+
+    ids: list[int] = []
+    count = 0
+    with ingest_mode() as connection:
+        for batch in _batched(rows, batch_size):
+            result = connection.execute(statement, batch)
+            if returning_ids:
+                ids.extend(result.scalars())
+            count += len(batch)
+    logger.debug(f"{count} rows inserted into {table.__tablename__}.")
+    return ids
+
+
+def _insert_rows_orm(table: type[BaseTable], rows: Iterable[dict[str, Any]], *, returning_ids: bool = False) -> list[int]:
+    with ingest_mode() as connection, Session(connection) as session:
+        objects = [table(**row) for row in rows]
+        session.add_all(objects)
+        session.flush()  # commit 之后主键会过期，需在此之前取出
+        ids = [_.id for _ in objects] if returning_ids else []
+        session.commit()
+    return ids
+
+
+class BatchWriter:
+    """
+    Insert rows on a dedicated thread while the caller keeps producing them.
+
+    调用方按块 `write()` (如一个文件的段落、一个段落的元素)，块经有界队列交给写入线程，
+    线程中由 `insert_rows` 分批写入、在同一事务内提交；队列满时调用方等待，积压的行数有上限。
+    退出 with 时等待写完，写入线程中的异常在此 (或之后的 write 时) 重新抛出；
+    with 块内出错则回滚，已写入的块一并作废。写入期间不要在其他连接上写同一数据库。
+    """
+    _STOP = object()
+    _ABORT = object()
+
+    def __init__(self, table: type[BaseTable], *, returning_ids: bool = False, batch_size: int | None = None, queue_size: int | None = None):
+        self._table = table
+        self._returning_ids = returning_ids
+        self._batch_size = batch_size
+        self._queue: Queue = Queue(maxsize=queue_size or settings.database.queue_size)
+        self._thread = Thread(target=self._run, name=f"{table.__tablename__}-writer", daemon=True)
+        self._ids: list[int] = []
+        self._error: BaseException | None = None
+        self._drained: bool = False
+
+    def write(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Queue a chunk of rows, wait if the writer is too far behind."""
+        if self._error is not None:
+            raise self._error
+        if rows := list(rows):
+            self._queue.put(rows)
+
+    def close(self, *, abort: bool = False) -> list[int]:
+        """Wait until all queued rows are written, return their ids in order if `returning_ids`."""
+        if self._thread.is_alive():
+            self._queue.put(self._ABORT if abort else self._STOP)
+            self._thread.join()
+        if self._error is not None and not abort:
+            raise self._error
+        return self._ids
+
+    def _run(self) -> None:
+        try:
+            self._ids = insert_rows(self._table, self._iter_rows(), returning_ids=self._returning_ids, batch_size=self._batch_size)
+        except BaseException as e:
+            self._error = e
+            # 继续取空队列直到收到结束标记，避免调用方阻塞在 put 上
+            while not self._drained:
+                rows = self._queue.get()
+                self._drained = rows is self._STOP or rows is self._ABORT
+
+    def _iter_rows(self) -> Iterator[dict[str, Any]]:
+        while True:
+            rows = self._queue.get()
+            if rows is self._STOP or rows is self._ABORT:
+                self._drained = True
+                if rows is self._ABORT:
+                    raise _WriteAborted
+                return
+            yield from rows
+
+    def __enter__(self) -> "BatchWriter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(abort=exc_type is not None)
+
+    @property
+    def ids(self) -> list[int]:
+        return self._ids
+
+
+class _WriteAborted(Exception):
+    """with BatchWriter 块内出错，令写入线程中的事务回滚"""
+
+
+def _batched(rows: Iterable[dict[str, Any]], batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
 
 
 __all__ = [
-    "ENGINE"
-]
\ No newline at end of file
+    "ENGINE",
+    "SCHEMA_VERSION",
+    "init_database",
+    "create_run",
+    "get_latest_run_id",
+    "ingest_mode",
+    "insert_rows",
+    "BatchWriter",
+]
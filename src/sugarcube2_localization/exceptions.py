@@ -18,6 +18,42 @@ class GameRootNotExistException(_BaseException):
         super().__init__(message="Game root is blank or not correct!")
 
 
+class FullTextSearchNotEnabledException(_BaseException):
+    def __init__(self):
+        super().__init__(message="Full-text search is not enabled, set DATABASE_FTS=true and parse again (or rebuild_index)!")
+
+
+class RunNotFoundException(_BaseException):
+    def __init__(self, game: str):
+        super().__init__(message=f"No parse of '{game}' with passages found in the database, parse the game first or pass run_id!")
+
+
+class PassageNotWrittenException(_BaseException):
+    def __init__(self, filepath: str, title: str):
+        super().__init__(message=f"Passage '{title}' in {filepath} is not written in this run, elements cannot refer to it!")
+
+
+class AcornNotInstalledException(_BaseException):
+    def __init__(self, bundle_dir):
+        super().__init__(message=f"acorn.js not found in {bundle_dir}, run `python -m sugarcube2_localization.core.acorn` once to vendor it!")
+
+
+class AcornEvaluationException(_BaseException):
+    def __init__(self, message: str | None):
+        super().__init__(message=f"acorn failed without a syntax error (check the parser options): {message}")
+
+
+class JSBackendNotAvailableException(_BaseException):
+    def __init__(self, name: str):
+        super().__init__(message=f"JavaScript backend '{name}' is unknown or not available on this machine, set JAVASCRIPT_BACKEND=auto to pick one!")
+
+
 __all__ = [
     "GameRootNotExistException",
+    "FullTextSearchNotEnabledException",
+    "RunNotFoundException",
+    "PassageNotWrittenException",
+    "AcornNotInstalledException",
+    "AcornEvaluationException",
+    "JSBackendNotAvailableException",
 ]
\ No newline at end of file
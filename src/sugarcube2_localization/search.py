@@ -0,0 +1,96 @@
+"""
+Full-text search over the plain texts of parsed passages.
+
+需开启 settings.database.fts：建表时会一并创建 FTS5 索引 (见 sql_model 中的 element_fts)，
+解析写入元素后由 `index_elements` 按解析同步，之后即可用 `search_elements` 查询原文出现在哪些段落、块中。
+"""
+from sqlalchemy import text
+
+from sugarcube2_localization.config import settings
+from sugarcube2_localization.database import ENGINE, ingest_mode, init_database
+from sugarcube2_localization.exceptions import FullTextSearchNotEnabledException
+from sugarcube2_localization.log import logger
+from sugarcube2_localization.core.schema.data_model import ElementSearchResultModel
+
+_INDEX_RUN = text("INSERT INTO element_fts(rowid, body) SELECT id, body FROM element_text WHERE run_id = :run_id")
+_REBUILD = text("INSERT INTO element_fts(element_fts) VALUES('rebuild')")
+_LATEST_RUN = text("SELECT max(run_id) FROM element")
+# 纯文本元素本身没有语义化键，取包裹它的块首：同一段落中位于其前、层级不高于它的最近一个块首，
+# 与 Twee3Parser._build_semantic_keys 中确定父块的规则一致
+_SEARCH = text("""
+SELECT
+    file.filepath AS filepath,
+    passage.title AS passage,
+    (
+        SELECT head.block_semantic_key FROM element AS head
+        WHERE head.passage_id = element.passage_id
+            AND head.pos_start <= element.pos_start
+            AND head.level <= element.level
+            AND head.block_semantic_key IS NOT NULL
+        ORDER BY head.pos_start DESC
+        LIMIT 1
+    ) AS block_semantic_key,
+    element.pos_start AS pos_start,
+    element.pos_end AS pos_end,
+    snippet(element_fts, 0, '[', ']', '...', :snippet_tokens) AS snippet
+FROM element_fts
+    JOIN element ON element.id = element_fts.rowid
+    JOIN passage ON passage.id = element.passage_id
+    JOIN file ON file.id = passage.file_id
+WHERE element_fts MATCH :query AND element.run_id = :run_id
+ORDER BY element_fts.rank
+LIMIT :limit
+""")
+
+
+def index_elements(run_id: int) -> int:
+    """Add plain-text elements of the run to the index, return how many were added."""
+    _check_enabled()
+    with ingest_mode() as connection:
+        count = connection.execute(_INDEX_RUN, {"run_id": run_id}).rowcount
+    logger.debug(f"{count} elements of run {run_id} indexed for full-text search.")
+    return count
+
+
+def rebuild_index() -> None:
+    """Re-index every run from the element table, e.g. for runs parsed before fts was enabled."""
+    _check_enabled()
+    with ingest_mode() as connection:
+        connection.execute(_REBUILD)
+    logger.info("Full-text search index rebuilt.")
+
+
+def search_elements(query: str, *, run_id: int | None = None, phrase: bool = True, limit: int = 50, snippet_tokens: int = 16) -> list[ElementSearchResultModel]:
+    """
+    Find plain-text elements containing the query, best matches first.
+
+    `phrase` 为 True 时按原样整句匹配 (忽略大小写与标点)，否则 query 按 FTS5 查询语法解析，
+    如 `cat AND mat`、`"the mat" NOT dog`、`spok*`。`run_id` 默认为最近一次解析。
+    """
+    _check_enabled()
+    if phrase:
+        query = '"{}"'.format(query.replace('"', '""'))
+
+    with ENGINE.connect() as connection:
+        if run_id is None:
+            run_id = connection.execute(_LATEST_RUN).scalar()
+        rows = connection.execute(_SEARCH, {
+            "query": query,
+            "run_id": run_id,
+            "limit": limit,
+            "snippet_tokens": snippet_tokens,
+        }).mappings()
+        return [ElementSearchResultModel.model_validate(dict(row)) for row in rows]
+
+
+def _check_enabled() -> None:
+    if not settings.database.fts:
+        raise FullTextSearchNotEnabledException
+    init_database()
+
+
+__all__ = [
+    "index_elements",
+    "rebuild_index",
+    "search_elements",
+]
@@ -0,0 +1,288 @@
+"""性能基准：对比新旧实现的耗时，并校验二者结果一致"""
+import tempfile
+import time
+import tracemalloc
+
+from functools import partial
+from loguru._logger import Logger
+from pathlib import Path
+from sqlalchemy import create_engine, delete, event, insert
+from typing import Callable, TypeVar
+
+from sugarcube2_localization.config import DIR_DOL, settings
+from sugarcube2_localization.database import ENGINE, _batched, _get_pragmas
+from sugarcube2_localization.log import logger
+
+from sugarcube2_localization.core.acorn import DIR_ACORN
+from sugarcube2_localization.core.jsbackend import BACKENDS
+from sugarcube2_localization.core.parser.twee3 import Twee3Parser
+from sugarcube2_localization.core.schema.data_model import AcornParserOptions
+from sugarcube2_localization.core.schema.enum import Patterns
+from sugarcube2_localization.core.schema.sql_model import BaseTable, ElementModelTable
+from sugarcube2_localization.core.utils import get_all_filepaths
+
+T = TypeVar("T")
+
+
+class Benchmark:
+	def __init__(self, game_root: Path = DIR_DOL, repeat: int = 3):
+		self._game_root = game_root
+		self._repeat = repeat
+		self._logger = logger.bind(project_name="BMK")
+
+	def twee3_lexer(self, *, is_old_macro: bool = True) -> dict:
+		"""单次扫描的合并正则 vs 逐个正则扫描 + 过滤嵌套元素"""
+		parser = Twee3Parser(game_root=self.game_root)
+		all_passages = parser.all_passages or parser.get_all_passages_info()[0]
+		all_passages = [_ for _ in all_passages if not (_.tag and _.tag.lower() == "script")]
+		lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+
+		legacy_time, legacy = self._best_of(lambda: [self._lex_legacy(passage.body, is_old_macro) for passage in all_passages])
+		current_time, current = self._best_of(lambda: [self._lex_current(passage.body, lexer) for passage in all_passages])
+		mismatched: list[str] = [
+			passage.title
+			for passage, legacy_elements, current_elements in zip(all_passages, legacy, current)
+			if legacy_elements != current_elements
+		]
+
+		self.logger.info(f"{len(all_passages)} passages lexed, best of {self.repeat}")
+		self.logger.info(f"legacy : {legacy_time:.3f}s")
+		self.logger.info(f"current: {current_time:.3f}s ({legacy_time / current_time:.1f}x)")
+		if mismatched:
+			self.logger.warning(f"{len(mismatched)} passages differ: {mismatched[:10]}")
+		else:
+			self.logger.success("All elements are identical.")
+
+		return {
+			"passages": len(all_passages),
+			"legacy": legacy_time,
+			"current": current_time,
+			"mismatched": mismatched,
+		}
+
+	def element_store(self, *, is_old_macro: bool = True) -> dict:
+		"""
+		列式的 ElementStore vs 逐个元素的 ElementModel：常驻内存、构建耗时与遍历字段的耗时。
+		二者共用段落主体与参数等字符串，内存只统计容器本身。
+		"""
+		parser = Twee3Parser(game_root=self.game_root)
+		all_passages = parser.all_passages or parser.get_all_passages_info()[0]
+		lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+
+		stores_time, stores = self._best_of(lambda: [parser._get_element_info(passage, lexer) for passage in all_passages])
+		models_time, models = self._best_of(lambda: [elements.to_models() for elements in stores])
+		stores_memory, _ = self._retained(lambda: [parser._get_element_info(passage, lexer) for passage in all_passages])
+		models_memory, _ = self._retained(lambda: [elements.to_models() for elements in stores])
+
+		stores_read_time, _ = self._best_of(lambda: [self._read_fields(elements) for elements in stores])
+		models_read_time, _ = self._best_of(lambda: [self._read_fields(elements) for elements in models])
+		elements_count = sum(len(_) for _ in stores)
+
+		self.logger.info(f"{elements_count} elements in {len(all_passages)} passages, best of {self.repeat}")
+		self.logger.info(f"store : {stores_memory / 2**20:.1f}MiB, lexed in {stores_time:.3f}s, read in {stores_read_time:.3f}s")
+		self.logger.info(f"models: {models_memory / 2**20:.1f}MiB, converted in +{models_time:.3f}s, read in {models_read_time:.3f}s")
+		self.logger.info(f"memory: {models_memory / max(stores_memory, 1):.1f}x smaller")
+
+		return {
+			"elements": elements_count,
+			"store_memory": stores_memory,
+			"models_memory": models_memory,
+			"store_build": stores_time,
+			"models_build": stores_time + models_time,
+			"store_read": stores_read_time,
+			"models_read": models_read_time,
+		}
+
+	def sqlite_ingest(self, *, is_old_macro: bool = True) -> dict:
+		"""
+		批量写入配置 vs 原先的默认配置 (journal_mode=DELETE, synchronous=FULL, 默认缓存)：将全部元素写入数据库的耗时。
+		二者都在临时目录中的空数据库里用 Core executemany 在一个事务中分批写入，只有连接的 PRAGMA 不同，不接触项目的数据库。
+		"""
+		parser = Twee3Parser(game_root=self.game_root)
+		rows = [row for elements in parser.get_all_elements_stores(is_old_macro=is_old_macro).values() for row in elements.to_rows(run_id=parser.run_id)]
+		profiles = {
+			"baseline": {"journal_mode": "DELETE", "synchronous": "FULL"},
+			"ingest": {"journal_mode": settings.database.journal_mode, **_get_pragmas("ingest")},
+		}
+
+		timings: dict[str, float] = {}
+		with tempfile.TemporaryDirectory() as tmpdir:
+			for name, pragmas in profiles.items():
+				engine = create_engine(f"sqlite+pysqlite:///{tmpdir}/{name}.db")
+				event.listen(engine, "connect", partial(self._set_pragmas, pragmas=pragmas))
+				BaseTable.metadata.create_all(engine)
+
+				def clear() -> None:
+					with engine.begin() as connection:
+						connection.execute(delete(ElementModelTable))
+
+				def ingest() -> None:
+					with engine.begin() as connection:
+						for batch in _batched(rows, settings.database.batch_size):
+							connection.execute(insert(ElementModelTable), batch)
+
+				timings[name], _ = self._best_of(ingest, setup=clear)
+				engine.dispose()
+
+		self.logger.info(f"{len(rows)} rows inserted, best of {self.repeat}")
+		self.logger.info(f"baseline: {timings['baseline']:.3f}s {profiles['baseline']}")
+		self.logger.info(f"ingest  : {timings['ingest']:.3f}s ({timings['baseline'] / timings['ingest']:.1f}x) {profiles['ingest']}")
+		return {
+			"rows": len(rows),
+			**timings,
+		}
+
+	def element_lookup(self, *, samples: int = 20) -> dict:
+		"""
+		按段落取元素、按语义键散列查元素：走索引 vs `NOT INDEXED` 全表扫描。
+		使用数据库中最近一次解析的结果，需先解析过。
+		"""
+		queries = {
+			"passage": "SELECT id FROM element {} WHERE passage_id = ? ORDER BY pos_start",
+			"semantic_key": "SELECT id FROM element {} WHERE block_semantic_key_hash = ?",
+		}
+		with ENGINE.connect() as connection:
+			params = {
+				"passage": connection.exec_driver_sql(f"SELECT id FROM passage ORDER BY random() LIMIT {samples}").scalars().all(),
+				"semantic_key": connection.exec_driver_sql(f"SELECT block_semantic_key_hash FROM element WHERE block_semantic_key_hash IS NOT NULL ORDER BY random() LIMIT {samples}").scalars().all(),
+			}
+
+			def lookup(query: str, hint: str) -> None:
+				for param in params[query]:
+					connection.exec_driver_sql(queries[query].format(hint), (param,)).all()
+
+			result = {}
+			for query in queries:
+				scan_time, _ = self._best_of(lambda: lookup(query, "NOT INDEXED"))
+				index_time, _ = self._best_of(lambda: lookup(query, ""))
+				self.logger.info(f"{query}: scan {scan_time / samples * 1e3:.3f}ms, index {index_time / samples * 1e3:.3f}ms per lookup ({scan_time / index_time:.0f}x)")
+				result[query] = {"scan": scan_time / samples, "index": index_time / samples}
+		return result
+
+	def js_backends(self) -> dict:
+		"""
+		各 JS 引擎运行同一份 acorn 解析游戏全部 .js 文件 (含顶层节点) 的耗时，并校验结果一致。
+		`JavaScriptSettings.backend` 为 auto 时运行时的选择与此相同，只是样本为 acorn.js 本身。
+		"""
+		all_filepaths = sorted(get_all_filepaths(".js", self.game_root / "game"))
+		samples = [filepath.read_text(encoding="utf-8") for filepath in all_filepaths]
+		options = AcornParserOptions(locations=False, ranges=False).model_dump()
+
+		timings: dict[str, float] = {}
+		expected: list[dict] | None = None
+		mismatched: dict[str, list[str]] = {}
+		for backend_class in BACKENDS.values():
+			if not backend_class.available():
+				self.logger.info(f"{backend_class.name}: not available")
+				continue
+			backend = backend_class(DIR_ACORN)
+			backend.load()
+			try:
+				timings[backend.name], results = self._best_of(lambda: [backend.parse(sample, options, True) for sample in samples])
+			finally:
+				backend.close()
+			if expected is None:
+				expected = results
+			elif differ := [str(filepath) for filepath, result, expected_result in zip(all_filepaths, results, expected) if result != expected_result]:
+				mismatched[backend.name] = differ
+
+		fastest = min(timings, key=timings.get)
+		self.logger.info(f"{len(samples)} files ({sum(map(len, samples)) / 2**20:.1f}MiB) parsed, best of {self.repeat}")
+		for name, timing in timings.items():
+			self.logger.info(f"{name:<6}: {timing:.3f}s ({timings[fastest] / timing:.2f}x of the fastest)")
+		self.logger.success(f"fastest: {fastest}")
+		for name, differ in mismatched.items():
+			self.logger.warning(f"{name}: {len(differ)} files differ: {differ[:10]}")
+
+		return {
+			"files": len(samples),
+			"timings": timings,
+			"fastest": fastest,
+			"mismatched": mismatched,
+		}
+
+	@staticmethod
+	def _set_pragmas(dbapi_connection, connection_record, *, pragmas: dict[str, str | int]) -> None:
+		cursor = dbapi_connection.cursor()
+		for name, value in pragmas.items():
+			cursor.execute(f"PRAGMA {name}={value}")
+		cursor.close()
+
+	@staticmethod
+	def _read_fields(elements) -> int:
+		"""逐个元素读取常用字段，模拟重分类、写入数据库时的访问"""
+		total = 0
+		for element in elements:
+			total += element.length + element.level
+			if element.type and element.block is None and element.widget is None:
+				total += 1
+		return total
+
+	@staticmethod
+	def _retained(func: Callable[[], T]) -> tuple[int, T]:
+		"""执行后仍被结果占用的内存 (字节)"""
+		tracemalloc.start()
+		try:
+			before = tracemalloc.get_traced_memory()[0]
+			result = func()
+			after = tracemalloc.get_traced_memory()[0]
+		finally:
+			tracemalloc.stop()
+		return after - before, result
+
+	@staticmethod
+	def _lex_legacy(body: str, is_old_macro: bool) -> list[tuple[str, int, int]]:
+		"""原实现：每种正则各扫描一次，排序后再两两比较去掉被包裹的元素"""
+		patterns = {Patterns.Comment, Patterns.MacroOld, Patterns.Tag} if is_old_macro else {Patterns.Comment, Patterns.Macro, Patterns.Tag}
+		elements = sorted(
+			((pattern.name, match.start(), match.end()) for pattern in patterns for match in pattern.value.finditer(body)),
+			key=lambda elem: elem[1]
+		)
+		elements_copy = elements.copy()
+		for idx, element in enumerate(elements_copy):
+			for i in range(1, len(elements_copy) - idx):
+				if elements_copy[idx+i][1] < element[2]:
+					elements[idx+i] = None
+		return [_ for _ in elements if _ is not None]
+
+	@staticmethod
+	def _lex_current(body: str, lexer: Patterns) -> list[tuple[str, int, int]]:
+		return [(match.lastgroup, match.start(), match.end()) for match in lexer.value.finditer(body)]
+
+	def _best_of(self, func: Callable[[], T], setup: Callable[[], None] | None = None) -> tuple[float, T]:
+		"""重复执行取最短耗时，同时返回结果用于校验；`setup` 在每次执行前调用，不计入耗时"""
+		timings = []
+		result = None
+		for _ in range(self.repeat):
+			if setup is not None:
+				setup()
+			start = time.perf_counter()
+			result = func()
+			timings.append(time.perf_counter() - start)
+		return min(timings), result
+
+	@property
+	def game_root(self) -> Path:
+		return self._game_root
+
+	@property
+	def repeat(self) -> int:
+		return self._repeat
+
+	@property
+	def logger(self) -> Logger:
+		return self._logger
+
+
+__all__ = [
+	"Benchmark",
+]
+
+
+if __name__ == '__main__':
+	benchmark = Benchmark()
+	benchmark.twee3_lexer(is_old_macro=True)
+	benchmark.element_store(is_old_macro=True)
+	benchmark.sqlite_ingest(is_old_macro=True)
+	benchmark.element_lookup()
+	benchmark.js_backends()
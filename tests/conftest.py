@@ -0,0 +1,16 @@
+"""
+Point every data directory of the project at a temporary directory before the package is imported,
+so that tests never touch data/ of the working tree.
+"""
+import os
+import tempfile
+
+from pathlib import Path
+
+_DIR_TMP = Path(tempfile.mkdtemp(prefix="sugarcube2-localization-tests-"))
+for _name in ("data", "log", "database", "cache", "tmp"):
+	os.environ[f"PATH_{_name.upper()}"] = str(_DIR_TMP / _name)
+os.environ.setdefault("PROJECT_LOG_LEVEL", "WARNING")
+os.environ.setdefault("PARATRANZ_PROJECT_ID", "0")
+os.environ.setdefault("PARATRANZ_TOKEN", "")
+os.environ.setdefault("GITHUB_ACCESS_TOKEN", "")
@@ -0,0 +1,59 @@
+"""ParseCache and its use by Twee3Parser."""
+from pathlib import Path
+
+from sugarcube2_localization.cache import ParseCache
+from sugarcube2_localization.core.parser.twee3 import Twee3Parser
+
+
+def test_hit_and_miss(tmp_path: Path):
+	cache = ParseCache("test", "1", directory=tmp_path)
+	cache.set("a.twee", ParseCache.hash_content("old"), ["parsed"])
+	cache.save()
+
+	cache = ParseCache("test", "1", directory=tmp_path)
+	assert cache.get("a.twee", ParseCache.hash_content("old")) == ["parsed"]
+	assert cache.get("a.twee", ParseCache.hash_content("new")) is None
+	assert cache.get("b.twee", ParseCache.hash_content("old")) is None
+
+
+def test_evict_files_no_longer_alive(tmp_path: Path):
+	cache = ParseCache("test", "1", directory=tmp_path)
+	for filepath in ("a.twee", "b.twee", "c.twee"):
+		cache.set(filepath, ParseCache.hash_content(filepath), filepath)
+
+	assert cache.evict(["a.twee", "c.twee"]) == 1
+	assert "b.twee" not in cache and len(cache) == 2
+	assert len(list(cache.directory.glob("*.pickle"))) == 2
+
+
+def test_version_change_drops_namespace(tmp_path: Path):
+	cache = ParseCache("test", "1", directory=tmp_path)
+	cache.set("a.twee", ParseCache.hash_content("a"), "a")
+	cache.save()
+
+	cache = ParseCache("test", "2", directory=tmp_path)
+	assert len(cache) == 0
+	assert cache.get("a.twee", ParseCache.hash_content("a")) is None
+
+
+def test_same_named_games_do_not_share_namespace(tmp_path: Path):
+	assert ParseCache.game_namespace("twee3", tmp_path / "one" / "game") != ParseCache.game_namespace("twee3", tmp_path / "two" / "game")
+	assert ParseCache.game_namespace("twee3", tmp_path / "one" / "game") == ParseCache.game_namespace("twee3", tmp_path / "one" / ".." / "one" / "game")
+
+
+def test_parser_lexes_only_changed_files(tmp_path: Path, monkeypatch):
+	(tmp_path / "game").mkdir()
+	(tmp_path / "game" / "a.twee").write_text(":: A\n<<if $x>>a<</if>>\n", encoding="utf-8")
+	(tmp_path / "game" / "b.twee").write_text(":: B\n<<set $y to 1>>\n", encoding="utf-8")
+	expected = {passage: elements.to_models() for passage, elements in Twee3Parser(game_root=tmp_path, use_cache=True).get_all_elements_stores().items()}
+
+	lexed: list[str] = []
+	get_element_info = Twee3Parser._get_element_info
+	monkeypatch.setattr(Twee3Parser, "_get_element_info", staticmethod(lambda passage, lexer: lexed.append(passage.title) or get_element_info(passage, lexer)))
+	all_elements_stores = Twee3Parser(game_root=tmp_path, use_cache=True).get_all_elements_stores()
+	assert lexed == []
+	assert {passage: elements.to_models() for passage, elements in all_elements_stores.items()} == expected
+
+	(tmp_path / "game" / "b.twee").write_text(":: B\n<<set $y to 2>>\n", encoding="utf-8")
+	Twee3Parser(game_root=tmp_path, use_cache=True).get_all_elements_stores()
+	assert lexed == ["B"]
@@ -0,0 +1,52 @@
+"""JavaScriptParser and JavascriptReviewer, serial against the process pool."""
+import pytest
+
+from pathlib import Path
+from sqlalchemy import select
+
+from sugarcube2_localization.database import ENGINE
+from sugarcube2_localization.core.parser.javascript import JavaScriptParser
+from sugarcube2_localization.core.reviewer.javascript import JavascriptReviewer
+from sugarcube2_localization.core.schema.sql_model import NodeModelTable
+
+
+@pytest.fixture
+def game_root(tmp_path: Path) -> Path:
+	(tmp_path / "game" / "lib").mkdir(parents=True)
+	for idx in range(6):
+		(tmp_path / "game" / "lib" / f"module{idx}.js").write_text(
+			f"var value{idx} = {idx};\nfunction get{idx}() {{ return value{idx} * 2; }}\nsetup.get{idx} = get{idx};\n",
+			encoding="utf-8",
+		)
+	(tmp_path / "game" / "broken.js").write_text("var ok = 1;\nvar broken = @;\n", encoding="utf-8")
+	return tmp_path
+
+
+def _tokenize(game_root: Path, max_workers: int) -> list[tuple]:
+	parser = JavaScriptParser(game_root=game_root)
+	parser.tokenize(max_workers=max_workers)
+	with ENGINE.connect() as connection:
+		rows = connection.execute(
+			select(NodeModelTable.filepath, NodeModelTable.type, NodeModelTable.pos_start, NodeModelTable.pos_end, NodeModelTable.body)
+			.where(NodeModelTable.run_id == parser.run_id)
+			.order_by(NodeModelTable.id)
+		).all()
+	return [(Path(filepath).as_posix(), *row) for filepath, *row in rows]
+
+
+def test_parallel_tokenize_same_as_serial(game_root: Path):
+	serial = _tokenize(game_root, max_workers=1)
+	assert len(serial) == 6 * 3
+	assert serial[:3] == [
+		("game/lib/module0.js", "VariableDeclaration", 0, 15, "var value0 = 0;"),
+		("game/lib/module0.js", "FunctionDeclaration", 16, 54, "function get0() { return value0 * 2; }"),
+		("game/lib/module0.js", "ExpressionStatement", 55, 73, "setup.get0 = get0;"),
+	]
+	assert _tokenize(game_root, max_workers=2) == serial
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_review_reports_syntax_errors(game_root: Path, max_workers: int):
+	report = JavascriptReviewer(game_root=game_root).validate_basic_syntax(max_workers=max_workers)
+	assert report.total == 7
+	assert [(issue.check, issue.filepath.name, issue.line, issue.column) for issue in report.issues] == [("syntax", "broken.js", 2, 13)]
@@ -0,0 +1,62 @@
+"""Every available JavaScript backend runs the same vendored acorn and returns the same projection."""
+import json
+
+import pytest
+
+from sugarcube2_localization.config import DIR_CACHE
+from sugarcube2_localization.exceptions import JSBackendNotAvailableException
+from sugarcube2_localization.core.acorn import DIR_ACORN
+from sugarcube2_localization.core.jsbackend import BACKENDS, create_backend
+from sugarcube2_localization.core.schema.data_model import AcornParserOptions
+
+OPTIONS = AcornParserOptions(locations=False, ranges=False).model_dump()
+VALID_CODE = "var a = 1;\nfunction f(x) { return x < a; }\nf(2);\n"
+INVALID_CODE = "var a = 1;\nvar b = @;\n"
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+	if not BACKENDS[request.param].available():
+		pytest.skip(f"{request.param} is not available")
+	backend = create_backend(request.param, DIR_ACORN)
+	yield backend
+	backend.close()
+
+
+def test_top_level_nodes(backend):
+	assert backend.parse(VALID_CODE, OPTIONS, True) == {"nodes": [["VariableDeclaration", 0, 10], ["FunctionDeclaration", 11, 42], ["ExpressionStatement", 43, 48]]}
+	assert backend.parse(VALID_CODE, OPTIONS, False) == {}
+
+
+def test_syntax_error_position(backend):
+	error = backend.parse(INVALID_CODE, OPTIONS, True)["error"]
+	assert (error["pos"], error["loc"]) == (19, {"line": 2, "column": 8})
+	assert error["message"] == "Unexpected character '@' (2:8)"
+
+
+def test_backends_agree():
+	backends = [create_backend(name, DIR_ACORN) for name, backend_class in sorted(BACKENDS.items()) if backend_class.available()]
+	try:
+		assert len({backend.version for backend in backends}) == 1
+		for code in (VALID_CODE, INVALID_CODE, (DIR_ACORN / "acorn.js").read_text(encoding="utf-8")):
+			assert len({json.dumps(backend.parse(code, OPTIONS, True)) for backend in backends}) == 1
+	finally:
+		for backend in backends:
+			backend.close()
+
+
+def test_auto_remembers_its_choice():
+	backend = create_backend("auto", DIR_ACORN)
+	backend.close()
+	chosen = json.loads((DIR_CACHE / "acorn" / "backend.json").read_text(encoding="utf-8"))
+	assert chosen["backend"] == backend.name
+	assert set(chosen["timings"]) == {name for name, backend_class in BACKENDS.items() if backend_class.available()}
+
+	backend = create_backend("auto", DIR_ACORN)
+	backend.close()
+	assert backend.name == chosen["backend"]
+
+
+def test_unknown_backend():
+	with pytest.raises(JSBackendNotAvailableException):
+		create_backend("rhino", DIR_ACORN)
@@ -0,0 +1,45 @@
+"""The single-pass lexer against the original one-regex-per-kind lexer kept in `Benchmark`."""
+import pytest
+
+from pathlib import Path
+
+from sugarcube2_localization.core.schema.enum import Patterns
+from sugarcube2_localization.tools.benchmark import Benchmark
+
+DIR_FIXTURES = Path(__file__).parent / "fixtures"
+
+ORDINARY_BODIES = [
+	"",
+	"just some plain text, no markup at all",
+	"<<set $x to 1>>text<br><<if $x gt 1>>big<<else>>small<</if>>",
+	'<<link "Next" `setup.go(">>")`>><<goto "Home">><</link>>',
+	'<div class="a"><span>$pc.name</span></div> /* <<if>> */ <!-- <div> -->',
+	"<<print '<b>' + _tmp + '</b>'>> < not a tag > <<< not a macro",
+	"<<script>>var a = '<b>'; if (a < b) { x(); }<</script>><script>var q = 1 < 2;</script>",
+	*(filepath.read_text(encoding="utf-8") for filepath in sorted((DIR_FIXTURES / "twee3").glob("**/*.twee"))),
+]
+
+# 原实现按起点排序后，丢掉起点落在前一个元素 (即便它本身已被丢掉) 范围内的元素；
+# 注释中间开始、越过注释结尾的 macro 被丢掉后，会连带丢掉注释后面真正的元素。单次扫描不再丢失它们。
+DIVERGENT_BODIES = [
+	(' <!--<<ax<!-->x*//*"-->/*]] >>*/', [("Comment", 1, 14)], [("Comment", 1, 14), ("Comment", 17, 32)]),
+	("'<<!--<<--><b>>", [("Comment", 2, 11)], [("Comment", 2, 11), ("Tag", 11, 14)]),
+	("<!--<<-->%/'<</if>>", [("Comment", 0, 9)], [("Comment", 0, 9), ("{macro}", 12, 19)]),
+	("/*<<</b>/%*/<<set $a to '>>'>>\"", [("Comment", 0, 12)], [("Comment", 0, 12), ("{macro}", 12, 30)]),
+]
+
+
+@pytest.mark.parametrize("is_old_macro", [True, False])
+@pytest.mark.parametrize("body", ORDINARY_BODIES)
+def test_same_as_legacy_on_ordinary_input(body: str, is_old_macro: bool):
+	lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+	assert Benchmark._lex_current(body, lexer) == Benchmark._lex_legacy(body, is_old_macro)
+
+
+@pytest.mark.parametrize("is_old_macro", [True, False])
+@pytest.mark.parametrize(("body", "legacy", "current"), DIVERGENT_BODIES)
+def test_keeps_elements_legacy_dropped_after_comments(body: str, legacy: list, current: list, is_old_macro: bool):
+	lexer = Patterns.ElementOld if is_old_macro else Patterns.Element
+	macro = Patterns.MacroOld.name if is_old_macro else Patterns.Macro.name
+	assert Benchmark._lex_legacy(body, is_old_macro) == [(name.format(macro=macro), start, end) for name, start, end in legacy]
+	assert Benchmark._lex_current(body, lexer) == [(name.format(macro=macro), start, end) for name, start, end in current]
@@ -0,0 +1,51 @@
+"""Full-text search over plain-text elements."""
+import pytest
+
+from pathlib import Path
+
+from sugarcube2_localization import database
+from sugarcube2_localization.config import settings
+from sugarcube2_localization.exceptions import FullTextSearchNotEnabledException
+from sugarcube2_localization.search import search_elements
+from sugarcube2_localization.core.parser.twee3 import Twee3Parser
+
+
+@pytest.fixture
+def fts(monkeypatch):
+	monkeypatch.setattr(settings.database, "fts", True)
+	monkeypatch.setattr(database, "_initialized", False)  # 建表时一并创建全文索引
+
+
+def _parse(game_root: Path, content: str) -> int:
+	(game_root / "game").mkdir(exist_ok=True)
+	(game_root / "game" / "story.twee").write_text(content, encoding="utf-8")
+	parser = Twee3Parser(game_root=game_root)
+	list(parser.iter_elements(is_old_macro=True))
+	return parser.run_id
+
+
+def test_search_finds_passage_and_enclosing_block(tmp_path: Path, fts):
+	run_id = _parse(tmp_path, ":: Forest\nA lazy dog sleeps. <<if $day>>The quick brown fox jumps.<</if>>\n\n:: Field\nNothing here.\n")
+
+	results = search_elements("quick brown", run_id=run_id)
+	assert [(result.passage, result.block_semantic_key) for result in results] == [("Forest", "Forest||MacroOld::if<$day>[0]")]
+	assert results[0].snippet == "The [quick brown] fox jumps."
+
+	results = search_elements("lazy dog", run_id=run_id)
+	assert [(result.passage, result.block_semantic_key) for result in results] == [("Forest", None)]
+	assert search_elements("nothing there", run_id=run_id) == []
+
+
+def test_search_is_scoped_to_one_run(tmp_path: Path, fts):
+	old_run_id = _parse(tmp_path, ":: Forest\nAn old sentence.\n")
+	new_run_id = _parse(tmp_path, ":: Forest\nA new sentence.\n")
+
+	assert [result.passage for result in search_elements("old sentence", run_id=old_run_id)] == ["Forest"]
+	assert search_elements("old sentence", run_id=new_run_id) == []
+	assert [result.passage for result in search_elements("new sentence")] == ["Forest"]
+
+
+def test_search_requires_fts_enabled(monkeypatch):
+	monkeypatch.setattr(settings.database, "fts", False)
+	with pytest.raises(FullTextSearchNotEnabledException):
+		search_elements("anything")
@@ -0,0 +1,101 @@
+"""
+Twee3Parser output against the original implementation, and its streaming / parallel / cached modes against each other.
+
+fixtures/twee3/elements.json is the output of `get_all_elements_info` at the baseline commit on fixtures/twee3.
+"""
+import json
+
+import pytest
+
+from pathlib import Path
+from sqlalchemy import func, select
+
+from sugarcube2_localization.database import ENGINE
+from sugarcube2_localization.core.parser.twee3 import Twee3Parser
+from sugarcube2_localization.core.schema.data_model import ElementModel
+from sugarcube2_localization.core.schema.sql_model import ElementModelTable, PassageModelTable
+
+DIR_GAME = Path(__file__).parent / "fixtures" / "twee3"
+BASELINE_ELEMENTS: dict[str, list[list]] = json.loads((DIR_GAME / "elements.json").read_text(encoding="utf-8"))
+
+
+def _rows(elements) -> list[list]:
+	return sorted(
+		[element.filepath.as_posix(), element.passage, element.type, element.pos_start, element.pos_end, element.level, element.block, element.block_name, element.block_semantic_key]
+		for element in elements
+	)
+
+
+def _write_game(game_root: Path, content: str) -> Path:
+	(game_root / "game").mkdir(parents=True)
+	(game_root / "game" / "story.twee").write_text(content, encoding="utf-8")
+	return game_root
+
+
+@pytest.mark.parametrize("is_old_macro", [True, False])
+def test_elements_same_as_baseline(is_old_macro: bool):
+	all_elements, all_elements_by_passage = Twee3Parser(game_root=DIR_GAME).get_all_elements_info(is_old_macro=is_old_macro)
+	assert all(isinstance(element, ElementModel) for element in all_elements)
+	assert sum(map(len, all_elements_by_passage.values())) == len(all_elements)
+	assert _rows(all_elements) == BASELINE_ELEMENTS["is_old_macro" if is_old_macro else "is_new_macro"]
+
+
+@pytest.mark.parametrize(("low_memory", "max_workers", "use_cache"), [
+	(False, 1, False),
+	(True, 1, False),
+	(False, 2, False),
+	(False, 1, True),
+	(True, 1, True),
+])
+def test_iter_elements_modes_agree(low_memory: bool, max_workers: int, use_cache: bool):
+	for _ in range(2 if use_cache else 1):  # 开启缓存时第二次取缓存
+		parser = Twee3Parser(game_root=DIR_GAME, use_cache=use_cache)
+		all_elements = [element for elements in parser.iter_elements(is_old_macro=True, low_memory=low_memory, max_workers=max_workers) for element in elements]
+		assert _rows(all_elements) == BASELINE_ELEMENTS["is_old_macro"]
+
+	with ENGINE.connect() as connection:
+		elements_count = connection.execute(
+			select(func.count()).select_from(ElementModelTable).where(ElementModelTable.run_id == parser.run_id, ElementModelTable.passage_id.is_not(None))
+		).scalar()
+	assert elements_count == len(all_elements)
+
+
+def test_same_titles_in_one_file_refer_to_their_own_passage(tmp_path: Path):
+	game_root = _write_game(tmp_path, ":: A\nfirst <<set $x to 1>>\n\n:: A\nsecond <<if true>>yes<</if>>\n")
+	parser = Twee3Parser(game_root=game_root)
+	list(parser.iter_elements(is_old_macro=True))
+
+	with ENGINE.connect() as connection:
+		counts = connection.execute(
+			select(PassageModelTable.body, func.count(ElementModelTable.id))
+			.join(ElementModelTable, ElementModelTable.passage_id == PassageModelTable.id)
+			.where(PassageModelTable.run_id == parser.run_id)
+			.group_by(PassageModelTable.id)
+			.order_by(PassageModelTable.id)
+		).all()
+	assert [(body.split()[0], count) for body, count in counts] == [("first", 3), ("second", 5)]
+
+
+def test_unbalanced_passage_does_not_affect_the_next(tmp_path: Path):
+	game_root = _write_game(tmp_path, ":: Broken\n<<if $x>>never closed <div>\n\n:: After\n<<if $y>>closed<</if>>\n")
+	parser = Twee3Parser(game_root=game_root)
+	all_elements_stores = parser.get_all_elements_stores(is_old_macro=True)
+
+	assert parser.all_unbalanced_passages == {"Broken": (1, 0)}
+	assert [element.level for element in all_elements_stores["After"]] == [1, 1, 1, 0]
+
+
+def test_update_passage_same_as_full_parse(tmp_path: Path):
+	game_root = _write_game(tmp_path, ":: A\n<<if $x>>old<</if>>\n\n:: B\n<<link 'go'>><</link>>\n")
+	parser = Twee3Parser(game_root=game_root)
+	parser.get_all_elements_stores(is_old_macro=True)
+
+	(game_root / "game" / "story.twee").write_text(":: A\n<<if $x>>new <span>text</span><</if>>\n\n:: B\n<<link 'go'>><</link>>\n", encoding="utf-8")
+	fresh = Twee3Parser(game_root=game_root)
+	fresh_elements = fresh.get_all_elements_stores(is_old_macro=True)
+
+	passage = fresh.all_passages_by_passage["A"]
+	elements = parser.update_passage(passage, is_old_macro=True)
+	assert elements.to_models() == fresh_elements["A"].to_models()
+	assert parser.all_elements_by_passage["A"] == fresh_elements["A"].to_models()
+	assert parser.all_elements_by_passage["B"] == fresh_elements["B"].to_models()
@@ -0,0 +1,62 @@
+"""Twee3Reviewer reports: serial against parallel, changed passages only, and games never parsed."""
+import shutil
+
+import pytest
+
+from pathlib import Path
+
+from sugarcube2_localization.exceptions import RunNotFoundException
+from sugarcube2_localization.core.parser.twee3 import Twee3Parser
+from sugarcube2_localization.core.reviewer.twee3 import Twee3Reviewer
+
+DIR_GAME = Path(__file__).parent / "fixtures" / "twee3"
+BROKEN_PASSAGES = "".join(
+	f":: Broken {idx}\n<<if $x>>never closed <div>text</div>\n\n:: Fine {idx}\n<<if $y>>closed<</if>>\n\n"
+	for idx in range(6)
+)
+
+
+@pytest.fixture
+def game_root(tmp_path: Path) -> Path:
+	game_root = tmp_path / "game-root"
+	shutil.copytree(DIR_GAME / "game", game_root / "game")
+	(game_root / "game" / "broken.twee").write_text(BROKEN_PASSAGES, encoding="utf-8")
+	return game_root
+
+
+def _parse(game_root: Path) -> Twee3Parser:
+	parser = Twee3Parser(game_root=game_root)
+	parser.get_all_elements_stores(is_old_macro=True)
+	return parser
+
+
+def test_parallel_report_same_as_serial(game_root: Path):
+	parser = _parse(game_root)
+	serial = Twee3Reviewer(game_root=game_root, run_id=parser.run_id).validate_all_elements(max_workers=1)
+	parallel = Twee3Reviewer(game_root=game_root, run_id=parser.run_id).validate_all_elements(max_workers=2)
+
+	assert serial.total == len(parser.all_passages)
+	assert [issue.passage for issue in serial.issues if issue.check == "level"] == [f"Broken {idx}" for idx in range(6)]
+	assert parallel.model_dump() == serial.model_dump()
+
+
+def test_review_only_changed_passages(game_root: Path):
+	base_run_id = _parse(game_root).run_id
+	broken = game_root / "game" / "broken.twee"
+	broken.write_text(BROKEN_PASSAGES.replace(":: Fine 3\n<<if $y>>closed<</if>>", ":: Fine 3\n<<if $y>>now open"), encoding="utf-8")
+	run_id = _parse(game_root).run_id
+
+	report = Twee3Reviewer(game_root=game_root, run_id=run_id).validate_all_elements(base_run_id=base_run_id)
+	assert report.total == 1
+	assert report.failed == ["Fine 3"]
+
+
+def test_latest_run_is_reviewed_by_default(game_root: Path):
+	_parse(game_root)
+	run_id = _parse(game_root).run_id
+	assert Twee3Reviewer(game_root=game_root).run_id == run_id
+
+
+def test_game_never_parsed_raises(tmp_path: Path):
+	with pytest.raises(RunNotFoundException):
+		Twee3Reviewer(game_root=tmp_path / "never-parsed").validate_all_elements()